@@ -1,13 +1,19 @@
 import requests
 import gradio as gr
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+import uvicorn
 import logging
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from requests.exceptions import Timeout
 from urllib.request import urlopen, Request
 import json
-from huggingface_hub import InferenceClient
+import asyncio
+import httpx
+from huggingface_hub import InferenceClient, AsyncInferenceClient
 import random
 import time
 from sentence_transformers import SentenceTransformer, util
@@ -23,22 +29,38 @@ import io
 import requests
 import random
 import datetime
-from groq import Groq
+from groq import Groq, AsyncGroq
 import os
 from mistralai import Mistral
 from dotenv import load_dotenv
 import re
+import codecs
 from typing import List, Tuple
 from rank_bm25 import BM25Okapi
 from typing import List, Dict
 import numpy as np
-from math import log
-from collections import Counter
+from math import log, ceil
+from collections import Counter, deque
 import numpy as np
 from typing import List, Dict, Tuple
 import datetime
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed, wait
+from typing import Callable, Optional, Iterator, Set, Union
+from dataclasses import dataclass, field, asdict
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+import threading
+import contextvars
+import hashlib
+import copy
+import http.client
+import socket
+import sys
+import cProfile
+import pstats
+import uuid
 
 # Automatically get the current year
 CURRENT_YEAR = datetime.datetime.now().year
@@ -105,19 +127,200 @@ groq_client = Groq(api_key=GROQ_API_KEY)
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 mistral_client = Mistral(api_key=MISTRAL_API_KEY)
 
-# Initialize the similarity model
-similarity_model = SentenceTransformer('all-MiniLM-L6-v2')
+# Async clients share their connection pools across every concurrent chat
+async_hf_client = AsyncInferenceClient("mistralai/Mistral-Small-Instruct-2409", token=HF_TOKEN)
+async_groq_client = AsyncGroq(api_key=GROQ_API_KEY)
+
+# Per-call timeout and per-provider concurrency limit for LLM requests
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+# Provider routing: calls go to the requested provider first (the first of LLM_PROVIDERS for
+# rephrasing and relevance assessment), are hedged to the next one when they run past that
+# provider's LLM_HEDGE_PERCENTILE latency, and fail over on errors.
+LLM_PROVIDERS = [name.strip() for name in os.getenv("LLM_PROVIDERS", "huggingface,groq,mistral").split(",") if name.strip()]
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))  # 0 disables hedging
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "10"))  # seconds, until enough latencies are recorded
+LLM_SUMMARY_HEDGE_DELAY = float(os.getenv("LLM_SUMMARY_HEDGE_DELAY", "60"))  # the same for the far longer summary calls
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+LLM_SUMMARY_TIMEOUT = float(os.getenv("LLM_SUMMARY_TIMEOUT", "180"))
+
+# Initialize the similarity model. With a shared embedding server (embedding_server.py)
+# configured, the in-process model is only loaded if the server cannot be reached.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL", "")
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "10"))
+EMBEDDING_SERVER_RETRY_AFTER = 30  # seconds to stay on the local model after a server failure
+similarity_model = None if EMBEDDING_SERVER_URL else SentenceTransformer(EMBEDDING_MODEL)
+similarity_model_lock = threading.Lock()
+embedding_server_retry_at = 0.0
+embedding_session = requests.Session()
+
+def get_similarity_model() -> SentenceTransformer:
+    global similarity_model
+    with similarity_model_lock:
+        if similarity_model is None:
+            logger.info(f"Loading local embedding model {EMBEDDING_MODEL}")
+            similarity_model = SentenceTransformer(EMBEDDING_MODEL)
+    return similarity_model
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def encode_with_server(texts: List[str]) -> List[List[float]]:
+    if EMBEDDING_SERVER_URL.startswith("unix://"):
+        connection = UnixHTTPConnection(EMBEDDING_SERVER_URL[len("unix://"):], EMBEDDING_SERVER_TIMEOUT)
+        try:
+            connection.request("POST", "/encode", body=json.dumps({"texts": texts}), headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            body = response.read()
+            if response.status != 200:
+                raise RuntimeError(f"embedding server returned {response.status}: {body[:200]!r}")
+            return json.loads(body)["embeddings"]
+        finally:
+            connection.close()
+
+    response = embedding_session.post(f"{EMBEDDING_SERVER_URL.rstrip('/')}/encode", json={"texts": texts}, timeout=EMBEDDING_SERVER_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["embeddings"]
+
+def encode_texts(texts: Union[str, List[str]], convert_to_tensor: bool = True):
+    """
+    Drop-in for SentenceTransformer.encode: a single string gives one embedding, a list gives
+    one row per text. Uses the shared embedding server when configured, else the local model.
+    """
+    global embedding_server_retry_at
+    single = isinstance(texts, str)
+    batch = [texts] if single else list(texts)
+
+    if EMBEDDING_SERVER_URL and time.monotonic() >= embedding_server_retry_at:
+        try:
+            embeddings = torch.tensor(encode_with_server(batch), dtype=torch.float32)
+            if single:
+                embeddings = embeddings[0]
+            return embeddings if convert_to_tensor else embeddings.numpy()
+        except Exception as e:
+            logger.warning(f"Embedding server unavailable, encoding in-process for {EMBEDDING_SERVER_RETRY_AFTER}s: {e}")
+            embedding_server_retry_at = time.monotonic() + EMBEDDING_SERVER_RETRY_AFTER
 
+    return get_similarity_model().encode(texts, convert_to_tensor=convert_to_tensor)
 
 
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical work. The first caller for a key (the leader) runs the
+    function; callers arriving while it is in flight wait for the leader and share its
+    result, or get its exception raised.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls: Dict[Any, Future] = {}
+
+    def do(self, key, func: Callable, *args, **kwargs) -> Any:
+        is_leader, future = self.join(key)
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result=result)
+        return result
+
+    def join(self, key) -> Tuple[bool, Future]:
+        """
+        Lower-level form of `do` for work that isn't a single call. Returns (is_leader,
+        future); the leader must call `finish` for the key, followers wait on the future.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self.calls[key] = Future()
+        if not is_leader:
+            logger.info(f"Coalescing {self.name} with an identical in-flight call")
+        return is_leader, future
+
+    def finish(self, key, result: Any = None, error: Optional[BaseException] = None):
+        with self.lock:
+            future = self.calls.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on the shared LLM loop. The shared task is cancelled
+    only when every caller waiting on it has been cancelled.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: Dict[Any, list] = {}
+
+    async def do(self, key, coro_factory: Callable) -> Any:
+        entry = self.calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(coro_factory())
+            entry = self.calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self.calls.pop(key, None) if self.calls.get(key) is entry else None)
+        else:
+            logger.info(f"Coalescing {self.name} with an identical in-flight call")
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+def llm_call_key(*parts) -> str:
+    """Stable key for an LLM call from its provider, model, messages and sampling parameters."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+# Identical concurrent work is done once: whole requests, URL scrapes and LLM prompts
+request_flight = SingleFlight("search request")
+scrape_flight = SingleFlight("scrape")
+llm_flight = SingleFlight("LLM call")
+async_llm_flight = AsyncSingleFlight("async LLM call")
+
 # Step 1: Create a base class for AI models
 class AIModel(ABC):
+    provider = "sync"
+
     @abstractmethod
     def generate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
         pass
 
+    def generate(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, call: str = "") -> str:
+        """
+        generate_response, shared with identical calls already in flight and run once the
+        LLM scheduler grants a slot (`call` picks the priority class).
+        """
+        key = llm_call_key(type(self).__name__, getattr(self, "model_name", ""), messages, max_tokens, temperature)
+        return llm_flight.do(key, self.scheduled_response, messages, max_tokens, temperature, call)
+
+    def scheduled_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, call: str) -> str:
+        with llm_scheduler.sync_slot(self.provider, call, estimate_request_tokens(messages, max_tokens)):
+            return self.generate_response(messages, max_tokens, temperature)
+
 # Step 2: Implement specific classes for each AI model
 class HuggingFaceModel(AIModel):
+    provider = "huggingface"
+
     def __init__(self, client):
         self.client = client
 
@@ -130,6 +333,8 @@ class HuggingFaceModel(AIModel):
         return response.choices[0].message.content.strip()
 
 class GroqModel(AIModel):
+    provider = "groq"
+
     def __init__(self, client):
         self.client = client
 
@@ -143,6 +348,8 @@ class GroqModel(AIModel):
         return response.choices[0].message.content.strip()
 
 class MistralModel(AIModel):
+    provider = "mistral"
+
     def __init__(self, client):
         self.client = client
 
@@ -156,20 +363,25 @@ class MistralModel(AIModel):
         return response.choices[0].message.content.strip()
 
 # Step 3: Use a factory pattern to create model instances
+custom_llm_session = requests.Session()
+
 class CustomModel(AIModel):
+    provider = "custom"
+
     def __init__(self, model_name):
         self.model_name = model_name
 
     def generate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
         try:
-            response = requests.post(
+            response = custom_llm_session.post(
                 f"{CUSTOM_LLM}/v1/chat/completions",
                 json={
                     "model": self.model_name,
                     "messages": messages,
                     "max_tokens": max_tokens,
                     "temperature": temperature
-                }
+                },
+                timeout=LLM_TIMEOUT
             )
             response.raise_for_status()
             return response.json()["choices"][0]["message"]["content"].strip()
@@ -191,7 +403,475 @@ class AIModelFactory:
         else:
             raise ValueError(f"Unsupported model: {model_name}")
 
-def determine_query_type(query: str, chat_history: str, ai_model: AIModel) -> str:
+    @staticmethod
+    def create_async_model(model_name: str) -> "AsyncAIModel":
+        if model_name == "huggingface":
+            return AsyncHuggingFaceModel(async_hf_client)
+        elif model_name == "groq":
+            return AsyncGroqModel(async_groq_client)
+        elif model_name == "mistral":
+            return AsyncMistralModel(mistral_client)
+        elif CUSTOM_LLM and model_name in custom_models:
+            return AsyncCustomModel(model_name)
+        else:
+            raise ValueError(f"Unsupported model: {model_name}")
+
+# Async counterparts of the AI models. They all run on one shared event loop, so many
+# concurrent chats and fan-out calls do not need a thread per in-flight request.
+llm_loop = None
+llm_loop_lock = threading.Lock()
+
+def get_llm_loop() -> asyncio.AbstractEventLoop:
+    global llm_loop
+    with llm_loop_lock:
+        if llm_loop is None:
+            llm_loop = asyncio.new_event_loop()
+            threading.Thread(target=llm_loop.run_forever, name="llm-loop", daemon=True).start()
+    return llm_loop
+
+def run_on_llm_loop(coro, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the shared LLM loop from synchronous code and wait for its result.
+    On timeout the coroutine is cancelled, which cancels its in-flight requests.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_llm_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+# Process-wide LLM scheduling. Every LLM call waits for a slot from its provider's queue,
+# which enforces the provider's concurrency and per-minute quotas and releases waiting calls
+# by priority class, round-robin across sessions within a class.
+LLM_RATE_LIMITS: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+LLM_CONGESTION_WAIT = float(os.getenv("LLM_CONGESTION_WAIT", "2"))
+PRIORITY_INTERACTIVE, PRIORITY_BULK, PRIORITY_BACKGROUND = 0, 1, 2
+LLM_CALL_PRIORITIES = {
+    "classification": PRIORITY_INTERACTIVE,
+    "rephrase": PRIORITY_INTERACTIVE,
+    "answer": PRIORITY_INTERACTIVE,
+    "history_summary": PRIORITY_INTERACTIVE,
+    "assessment": PRIORITY_BULK,
+    "summary": PRIORITY_BULK,
+    "summary_map": PRIORITY_BULK,
+    "history_prefetch": PRIORITY_BACKGROUND,
+}
+# The chat or API request an LLM call is made for; calls are queued fairly between sessions
+llm_session: contextvars.ContextVar = contextvars.ContextVar("llm_session", default="default")
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    return sum(len(message["content"]) for message in messages) // 4 + max_tokens
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over each minute and holds at most a minute's worth."""
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float) -> float:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+class ProviderQueue:
+    """
+    LLM calls waiting for one provider. Only touched on the LLM loop.
+
+    Quotas come from LLM_RATE_LIMITS, e.g. {"groq": {"max_concurrency": 8,
+    "requests_per_minute": 30, "tokens_per_minute": 6000}}; tokens are estimated from the
+    prompt length plus max_tokens.
+    """
+    def __init__(self, provider: str):
+        limits = LLM_RATE_LIMITS.get(provider, {})
+        self.provider = provider
+        self.max_in_flight = int(limits.get("max_concurrency", LLM_MAX_CONCURRENCY))
+        self.buckets = [
+            (TokenBucket(limits["requests_per_minute"]), lambda tokens: 1) if "requests_per_minute" in limits else None,
+            (TokenBucket(limits["tokens_per_minute"]), lambda tokens: tokens) if "tokens_per_minute" in limits else None,
+        ]
+        self.buckets = [bucket for bucket in self.buckets if bucket is not None]
+        self.in_flight = 0
+        # One queue per priority class: session -> waiting (future, tokens, enqueued_at)
+        self.waiting: List[OrderedDict] = [OrderedDict() for _ in (PRIORITY_INTERACTIVE, PRIORITY_BULK, PRIORITY_BACKGROUND)]
+        self.queue_wait = 0.0  # moving average of the seconds calls spent waiting
+        # When the longest-waiting call was queued; a plain snapshot other threads may read
+        self.oldest_enqueued_at: Optional[float] = None
+        self.retry_handle = None
+
+    def enqueue(self, priority: int, session: str, future: asyncio.Future, tokens: int):
+        self.waiting[priority].setdefault(session, deque()).append((future, tokens, time.monotonic()))
+        self.dispatch()
+
+    def head(self) -> Optional[Tuple[OrderedDict, str, deque]]:
+        """The next call to release: highest priority first, then the session least recently served."""
+        for sessions in self.waiting:
+            while sessions:
+                session, waiters = next(iter(sessions.items()))
+                while waiters and waiters[0][0].done():  # cancelled while waiting
+                    waiters.popleft()
+                if waiters:
+                    return sessions, session, waiters
+                del sessions[session]
+        return None
+
+    def dispatch(self):
+        self.release_ready()
+        self.oldest_enqueued_at = min(
+            (waiters[0][2] for sessions in self.waiting for waiters in sessions.values() if waiters),
+            default=None
+        )
+
+    def release_ready(self):
+        while self.in_flight < self.max_in_flight:
+            head = self.head()
+            if head is None:
+                return
+            sessions, session, waiters = head
+            future, tokens, enqueued_at = waiters[0]
+            delay = max((bucket.wait_time(cost(tokens)) for bucket, cost in self.buckets), default=0.0)
+            if delay > 0:
+                if self.retry_handle is None:
+                    self.retry_handle = asyncio.get_running_loop().call_later(delay, self.retry)
+                return
+
+            waiters.popleft()
+            # Round-robin: the session goes to the back of its class
+            del sessions[session]
+            if waiters:
+                sessions[session] = waiters
+            for bucket, cost in self.buckets:
+                bucket.take(cost(tokens))
+            self.in_flight += 1
+            self.queue_wait = 0.8 * self.queue_wait + 0.2 * (time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def retry(self):
+        self.retry_handle = None
+        self.dispatch()
+
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+
+    def oldest_wait(self) -> float:
+        oldest_enqueued_at = self.oldest_enqueued_at
+        return 0.0 if oldest_enqueued_at is None else time.monotonic() - oldest_enqueued_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": [sum(len(waiters) for waiters in sessions.values()) for sessions in self.waiting],
+            "queue_wait": round(self.queue_wait, 3),
+            "oldest_wait": round(self.oldest_wait(), 3),
+        }
+
+class LLMScheduler:
+    def __init__(self):
+        self.queues: Dict[str, ProviderQueue] = {}
+
+    def queue(self, provider: str) -> ProviderQueue:
+        queue = self.queues.get(provider)
+        if queue is None:
+            queue = self.queues[provider] = ProviderQueue(provider)
+        return queue
+
+    async def acquire(self, provider: str, call: str, tokens: int):
+        queue = self.queue(provider)
+        future = asyncio.get_running_loop().create_future()
+        queue.enqueue(LLM_CALL_PRIORITIES.get(call, PRIORITY_BULK), llm_session.get(), future, tokens)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():  # granted just as the caller was cancelled
+                queue.release()
+            else:
+                queue.dispatch()  # drop the cancelled call from the oldest-wait snapshot
+            raise
+
+    def release(self, provider: str):
+        self.queues[provider].release()
+
+    @asynccontextmanager
+    async def slot(self, provider: str, call: str, tokens: int):
+        await self.acquire(provider, call, tokens)
+        try:
+            yield
+        finally:
+            self.release(provider)
+
+    @contextmanager
+    def sync_slot(self, provider: str, call: str, tokens: int):
+        """`slot` for blocking calls made outside the LLM loop."""
+        run_on_llm_loop(self.acquire(provider, call, tokens))
+        try:
+            yield
+        finally:
+            get_llm_loop().call_soon_threadsafe(self.release, provider)
+
+    def congested(self, provider: str) -> bool:
+        """
+        Backpressure signal: calls to `provider` are waiting longer than LLM_CONGESTION_WAIT.
+        Safe from any thread: it only reads numbers the LLM loop keeps up to date, never the
+        queues themselves, so the answer may be slightly stale.
+        """
+        queue = self.queues.get(provider)
+        return queue is not None and max(queue.queue_wait, queue.oldest_wait()) > LLM_CONGESTION_WAIT
+
+    async def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {provider: queue.stats() for provider, queue in self.queues.items()}
+
+llm_scheduler = LLMScheduler()
+
+def run_in_session(events: Iterator[Dict[str, Any]], session_id: str) -> Iterator[Dict[str, Any]]:
+    """
+    Step a pipeline event stream with `llm_session` set to session_id. Each step runs in the
+    same context, whichever thread resumes the generator.
+    """
+    context = contextvars.copy_context()
+    context.run(llm_session.set, session_id)
+    while True:
+        try:
+            event = context.run(next, events)
+        except StopIteration:
+            return
+        yield event
+
+class AsyncAIModel(ABC):
+    provider = "async"
+
+    @abstractmethod
+    async def agenerate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **sampling) -> str:
+        pass
+
+    async def generate(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, timeout: Optional[float] = None, call: str = "", **sampling) -> str:
+        """
+        Call the provider once the LLM scheduler grants a slot (`call` picks the priority
+        class), with a timeout. Cancelling the awaiting task cancels the request.
+        """
+        async def call_provider():
+            async with llm_scheduler.slot(self.provider, call, estimate_request_tokens(messages, max_tokens)):
+                return await asyncio.wait_for(
+                    self.agenerate_response(messages, max_tokens, temperature, **sampling),
+                    timeout or LLM_TIMEOUT
+                )
+
+        key = llm_call_key(self.provider, getattr(self, "model_name", ""), messages, max_tokens, temperature, sampling)
+        return await async_llm_flight.do(key, call_provider)
+
+class AsyncHuggingFaceModel(AsyncAIModel):
+    provider = "huggingface"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **sampling) -> str:
+        response = await self.client.chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **sampling
+        )
+        return response.choices[0].message.content.strip()
+
+class AsyncGroqModel(AsyncAIModel):
+    provider = "groq"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **sampling) -> str:
+        response = await self.client.chat.completions.create(
+            messages=messages,
+            model="llama-3.1-70b-versatile",
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **sampling
+        )
+        return response.choices[0].message.content.strip()
+
+class AsyncMistralModel(AsyncAIModel):
+    provider = "mistral"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **sampling) -> str:
+        response = await self.client.chat.complete_async(
+            model="open-mistral-nemo",
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **sampling
+        )
+        return response.choices[0].message.content.strip()
+
+# Pooled HTTP client for the custom LLM endpoint, created on the LLM loop on first use
+custom_llm_http_client = None
+
+class AsyncCustomModel(AsyncAIModel):
+    provider = "custom"
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **sampling) -> str:
+        global custom_llm_http_client
+        if custom_llm_http_client is None:
+            custom_llm_http_client = httpx.AsyncClient(
+                base_url=CUSTOM_LLM,
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY)
+            )
+        response = await custom_llm_http_client.post(
+            "/v1/chat/completions",
+            json={
+                "model": self.model_name,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                **sampling
+            }
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+class LatencyStats:
+    """Rolling window of recent call latencies for one provider and kind of call."""
+    def __init__(self, cold_start_delay: float, window: int = LLM_LATENCY_WINDOW):
+        self.cold_start_delay = cold_start_delay
+        self.latencies = deque(maxlen=window)
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def percentile(self, percent: float) -> Optional[float]:
+        with self.lock:
+            if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            return float(np.percentile(self.latencies, percent))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging a call, or None when hedging is disabled."""
+        if LLM_HEDGE_PERCENTILE <= 0:
+            return None
+        delay = self.percentile(LLM_HEDGE_PERCENTILE)
+        return self.cold_start_delay if delay is None else delay
+
+latency_stats: Dict[str, LatencyStats] = {}
+latency_stats_lock = threading.Lock()
+
+def get_latency_stats(provider: str, call: str) -> LatencyStats:
+    with latency_stats_lock:
+        stats = latency_stats.get(f"{provider}:{call}")
+        if stats is None:
+            cold_start_delay = LLM_SUMMARY_HEDGE_DELAY if call.startswith("summary") else LLM_HEDGE_DELAY
+            stats = latency_stats[f"{provider}:{call}"] = LatencyStats(cold_start_delay)
+        return stats
+
+class ProviderRouter(AsyncAIModel):
+    """
+    Sends a call to the first model and, if it is still running after that provider's
+    hedge delay, a duplicate to the next one; the first answer wins and the other request
+    is cancelled. A model that fails hands over to the next one immediately.
+
+    `call` names the kind of request (e.g. "rephrase", "summary") so that short and long
+    calls keep separate latency stats.
+    """
+    provider = "router"
+
+    def __init__(self, models: List[AsyncAIModel], call: str):
+        self.models = models
+        self.call = call
+
+    @classmethod
+    def for_model(cls, model_name: str, call: str) -> "ProviderRouter":
+        """Route to `model_name` first, then to the other LLM_PROVIDERS in order."""
+        names = [model_name] + [name for name in LLM_PROVIDERS if name != model_name]
+        return cls([AIModelFactory.create_async_model(name) for name in names], call)
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, **sampling) -> str:
+        return await self.generate(messages, max_tokens, temperature, **sampling)
+
+    async def generate(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float, timeout: Optional[float] = None, provider_options: Optional[Dict[str, Dict[str, Any]]] = None, **sampling) -> str:
+        """
+        Args:
+            provider_options: Per-provider overrides of max_tokens and sampling parameters;
+                a None value leaves the parameter out for that provider.
+        """
+        candidates = iter(self.models)
+        running: Dict[asyncio.Future, AsyncAIModel] = {}
+        hedge_losers: Set[asyncio.Future] = set()
+        last_error = None
+
+        def launch() -> bool:
+            model = next(candidates, None)
+            if model is None:
+                return False
+            options = {"max_tokens": max_tokens, **sampling, **(provider_options or {}).get(model.provider, {})}
+            options = {name: value for name, value in options.items() if value is not None}
+            running[asyncio.ensure_future(self.timed_generate(model, messages, temperature, timeout, options, hedge_losers))] = model
+            return True
+
+        launch()
+        can_hedge = True
+        try:
+            while running:
+                newest = list(running.values())[-1]
+                hedge_after = get_latency_stats(newest.provider, self.call).hedge_delay() if can_hedge else None
+                done, _ = await asyncio.wait(running, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    can_hedge = launch()
+                    if can_hedge:
+                        logger.info(f"Hedging slow {newest.provider} {self.call} call to {list(running.values())[-1].provider}")
+                    continue
+                for task in done:
+                    model = running.pop(task)
+                    if task.exception() is None:
+                        hedge_losers.update(running)
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"{model.provider} {self.call} call failed: {last_error}")
+                    if launch():
+                        logger.info(f"Failing over {self.call} call to {list(running.values())[-1].provider}")
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def timed_generate(self, model: AsyncAIModel, messages: List[Dict[str, str]], temperature: float, timeout: Optional[float], options: Dict[str, Any], hedge_losers: Set[asyncio.Future]) -> str:
+        stats = get_latency_stats(model.provider, self.call)
+        started = time.perf_counter()
+        try:
+            result = await model.generate(messages, temperature=temperature, timeout=timeout, call=self.call, **options)
+        except asyncio.CancelledError:
+            # Lost a hedge race: the elapsed time is still a lower bound on its latency. Calls
+            # cancelled by the caller (a deadline, a closed chat) say nothing about the provider.
+            if asyncio.current_task() in hedge_losers:
+                stats.record(time.perf_counter() - started)
+            raise
+        except Exception:
+            stats.record_error()
+            raise
+        stats.record(time.perf_counter() - started)
+        return result
+
+def build_classification_messages(query: str, chat_history: str) -> List[Dict[str, str]]:
     system_prompt = """You are Sentinel, an intelligent AI agent tasked with determining whether a user query requires a web search or can be answered using your existing knowledge base. Your knowledge cutoff date is 2023, and the current year is 2024. Your task is to analyze the query and decide on the appropriate action.
 
     Instructions for Sentinel:
@@ -230,24 +910,42 @@ def determine_query_type(query: str, chat_history: str, ai_model: AIModel) -> st
     Determine if this query requires a web search or can be answered from the knowledge base.
     """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
+def parse_query_type(response: str) -> str:
+    return "web_search" if response.strip().lower() == "web_search" else "knowledge_base"
+
+def determine_query_type(query: str, chat_history: str, ai_model: AIModel) -> str:
     try:
-        response = ai_model.generate_response(
-            messages=messages,
+        response = ai_model.generate(
+            messages=build_classification_messages(query, chat_history),
             max_tokens=10,
-            temperature=0.2
+            temperature=0.2,
+            call="classification"
         )
-        decision = response.strip().lower()
-        return "web_search" if decision == "web_search" else "knowledge_base"
+        return parse_query_type(response)
     except Exception as e:
         logger.error(f"Error determining query type: {e}")
         return "web_search"  # Default to web search if there's an error
 
-def generate_ai_response(query: str, chat_history: str, ai_model: AIModel, temperature: float) -> str:
+async def adetermine_query_type(query: str, chat_history: str, model: str) -> str:
+    try:
+        response = await ProviderRouter.for_model(model, "classification").generate(
+            build_classification_messages(query, chat_history),
+            max_tokens=10,
+            temperature=0.2
+        )
+        return parse_query_type(response)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Error determining query type: {e}")
+        return "web_search"
+
+def build_answer_messages(query: str, chat_history: str) -> List[Dict[str, str]]:
     system_prompt = """You are a helpful AI assistant. Provide a concise and informative response to the user's query based on your existing knowledge. Do not make up information or claim to have real-time data."""
 
     user_prompt = f"""
@@ -259,22 +957,37 @@ def generate_ai_response(query: str, chat_history: str, ai_model: AIModel, tempe
     Please provide a response to the query.
     """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
+def generate_ai_response(query: str, chat_history: str, ai_model: AIModel, temperature: float) -> str:
     try:
-        response = ai_model.generate_response(
-            messages=messages,
+        response = ai_model.generate(
+            messages=build_answer_messages(query, chat_history),
             max_tokens=500,
-            temperature=temperature
+            temperature=temperature,
+            call="answer"
         )
         return response
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
         return "I apologize, but I'm having trouble generating a response at the moment. Please try again later."
 
+async def agenerate_ai_response(query: str, chat_history: str, model: str, temperature: float, call: str = "answer") -> str:
+    try:
+        return await ProviderRouter.for_model(model, call).generate(
+            build_answer_messages(query, chat_history),
+            max_tokens=500,
+            temperature=temperature
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating AI response: {e}")
+        return "I apologize, but I'm having trouble generating a response at the moment. Please try again later."
+
 
 # Set up a session with retry mechanism
 def requests_retry_session(
@@ -296,6 +1009,146 @@ def requests_retry_session(
     session.mount('https://', adapter)
     return session
 
+# Share of the remaining request budget each pipeline stage may use when it starts.
+# Time a stage does not use rolls forward to the stages after it.
+DEADLINE_STAGE_SHARES = {
+    "history": 0.1,
+    "classification": 0.1,
+    "rephrase": 0.1,
+    "search_and_scrape": 0.4,
+    "assessment": 0.45,
+    "full_content": 0.25,
+    "summarization": 1.0,
+    "answer": 1.0,
+}
+
+# Worker pool used to abandon calls that outlive their stage budget
+DEADLINE_MAX_WORKERS = int(os.getenv("DEADLINE_MAX_WORKERS", "32"))
+deadline_executor = ThreadPoolExecutor(max_workers=DEADLINE_MAX_WORKERS, thread_name_prefix="deadline")
+
+class Deadline:
+    """
+    End-to-end time budget for a single request. A budget of 0 seconds means no limit.
+
+    Each pipeline stage takes its share of the remaining budget with `stage()`; stages that
+    run out of time record themselves in the shared `cut_short` list.
+    """
+    def __init__(self, seconds: float = 0, name: str = "request", cut_short: Optional[List[str]] = None):
+        self.name = name
+        self.expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+        self.cut_short = cut_short if cut_short is not None else []
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, default: float) -> float:
+        """Clamp a per-call network timeout to the time left in this budget."""
+        return max(min(default, self.remaining()), 0.1)
+
+    def wait_timeout(self) -> Optional[float]:
+        """Seconds to wait on work bounded by this budget, or None without a limit."""
+        return None if self.expires_at is None else self.remaining()
+
+    def stage(self, name: str) -> "Deadline":
+        stage = Deadline(name=name, cut_short=self.cut_short)
+        if self.expires_at is not None:
+            stage.expires_at = time.monotonic() + self.remaining() * DEADLINE_STAGE_SHARES.get(name, 1.0)
+        return stage
+
+    def mark_cut_short(self):
+        if self.name not in self.cut_short:
+            logger.warning(f"Deadline reached during stage '{self.name}', continuing with partial results")
+            self.cut_short.append(self.name)
+
+def run_with_deadline(deadline: Optional[Deadline], default: Any, func: Callable, *args, **kwargs) -> Any:
+    """
+    Run `func` within the time left on `deadline`.
+
+    If the budget runs out first the call is abandoned, the stage is marked as cut short
+    and `default` is returned in place of the result.
+    """
+    if deadline is None or deadline.expires_at is None:
+        return func(*args, **kwargs)
+    if deadline.expired():
+        deadline.mark_cut_short()
+        return default
+    # Run in the caller's context so the LLM scheduler still sees the request's session
+    future = deadline_executor.submit(contextvars.copy_context().run, run_for_request, func, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeoutError:
+        future.cancel()
+        deadline.mark_cut_short()
+        return default
+
+class Speculation:
+    """
+    Work started for a request before it is known to be needed, so it overlaps with the
+    decision that settles it. Each branch is either used with `result()` or dropped with
+    `drop()`: dropped branches are cancelled, and LLM calls stop their in-flight requests.
+
+    Outcomes per branch are "used", "timed_out", "cancelled" or "discarded" (it had already
+    finished or could not be stopped); `wasted` is the seconds dropped branches ran for.
+    """
+    def __init__(self):
+        self.pending: Dict[str, Tuple[Future, float]] = {}
+        self.finished_at: Dict[str, float] = {}
+        self.outcomes: Dict[str, str] = {}
+        self.wasted = 0.0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.pending
+
+    def start(self, name: str, executor: ThreadPoolExecutor, func: Callable, *args, **kwargs):
+        # Run in the caller's context so the LLM scheduler still sees the request's session
+        self.track(name, executor.submit(contextvars.copy_context().run, run_for_request, func, *args, **kwargs))
+
+    def start_async(self, name: str, coro):
+        self.track(name, asyncio.run_coroutine_threadsafe(coro, get_llm_loop()))
+
+    def track(self, name: str, future: Future):
+        self.pending[name] = (future, time.perf_counter())
+        future.add_done_callback(lambda _: self.finished_at.setdefault(name, time.perf_counter()))
+
+    def result(self, name: str, deadline: Optional[Deadline], default: Any) -> Any:
+        """The branch's result, waited for with the same semantics as `run_with_deadline`."""
+        future, _ = self.pending.pop(name)
+        self.outcomes[name] = "used"
+        try:
+            if deadline is None or deadline.expires_at is None:
+                return future.result()
+            return future.result(timeout=deadline.remaining())
+        except FutureTimeoutError:
+            future.cancel()
+            deadline.mark_cut_short()
+            self.outcomes[name] = "timed_out"
+            return default
+
+    def drop(self, name: str):
+        future, started = self.pending.pop(name)
+        self.outcomes[name] = "cancelled" if future.cancel() else "discarded"
+        self.wasted += self.finished_at.get(name, time.perf_counter()) - started
+        logger.info(f"Speculative branch '{name}' not needed ({self.outcomes[name]})")
+
+    def finish(self) -> Tuple[Dict[str, str], float]:
+        """Drop every branch that was never used; returns the outcomes and wasted seconds."""
+        for name in list(self.pending):
+            self.drop(name)
+        return dict(self.outcomes), round(self.wasted, 3)
+
+# Speculative branches get their own workers: a speculative fan-out search waits on
+# searxng_executor tasks, so running it on that pool could leave every worker waiting
+SPECULATION_MAX_WORKERS = int(os.getenv("SPECULATION_MAX_WORKERS", "8"))
+speculation_executor = ThreadPoolExecutor(max_workers=SPECULATION_MAX_WORKERS, thread_name_prefix="speculation")
+
+def same_query(a: str, b: str) -> bool:
+    return " ".join(a.split()).casefold() == " ".join(b.split()).casefold()
+
 def is_valid_url(url):
     try:
         result = urlparse(url)
@@ -303,63 +1156,40 @@ def is_valid_url(url):
     except ValueError:
         return False
 
-def scrape_pdf_content(url, max_chars=3000, timeout=5):
-    try:
-        logger.info(f"Scraping PDF content from: {url}")
-        
-        # Download the PDF file
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-        
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(response.content))
-        
-        # Extract text from all pages
-        content = ""
-        for page in pdf_reader.pages:
-            content += page.extract_text() + "\n"
-        
-        # Limit the content to max_chars
-        return content[:max_chars] if content else ""
-    except requests.Timeout:
-        logger.error(f"Timeout error while scraping PDF content from {url}")
-        return ""
-    except Exception as e:
-        logger.error(f"Error scraping PDF content from {url}: {e}")
-        return ""
+def extract_pdf_text(data: bytes, max_chars=3000) -> str:
+    # Create a PDF reader object
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
 
-def scrape_with_newspaper(url):
-    if url.lower().endswith('.pdf'):
-        return scrape_pdf_content(url)
-    
-    logger.info(f"Starting to scrape with Newspaper3k: {url}")
-    try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        
-        # Combine title and text
-        content = f"Title: {article.title}\n\n"
-        content += article.text
-        
-        # Add publish date if available
-        if article.publish_date:
-            content += f"\n\nPublish Date: {article.publish_date}"
-        
-        # Add authors if available
-        if article.authors:
-            content += f"\n\nAuthors: {', '.join(article.authors)}"
-        
-        # Add top image URL if available
-        if article.top_image:
-            content += f"\n\nTop Image URL: {article.top_image}"
-        
-        return content
-    except Exception as e:
-        logger.error(f"Error scraping {url} with Newspaper3k: {e}")
-        return ""
+    # Extract text page by page, stopping once we have enough
+    content = ""
+    for page in pdf_reader.pages:
+        content += page.extract_text() + "\n"
+        if len(content) >= max_chars:
+            break
+
+    # Limit the content to max_chars
+    return content[:max_chars] if content else ""
+
+def article_to_text(article) -> str:
+    # Combine title and text
+    content = f"Title: {article.title}\n\n"
+    content += article.text
+
+    # Add publish date if available
+    if article.publish_date:
+        content += f"\n\nPublish Date: {article.publish_date}"
 
-def rephrase_query(chat_history, query, temperature=0.2):
+    # Add authors if available
+    if article.authors:
+        content += f"\n\nAuthors: {', '.join(article.authors)}"
+
+    # Add top image URL if available
+    if article.top_image:
+        content += f"\n\nTop Image URL: {article.top_image}"
+
+    return content
+
+def build_rephrase_messages(chat_history, query) -> List[Dict[str, str]]:
     system_prompt = """You are a highly intelligent and context-aware conversational assistant. Your tasks are as follows:
 
 1. Determine if the new query is a continuation of the previous conversation or an entirely new topic.
@@ -421,20 +1251,22 @@ New query: {query}
 Current year: {CURRENT_YEAR}
 Rephrased query:"""
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
+def rephrase_query(chat_history, query, temperature=0.2, deadline: Optional[Deadline] = None):
+    # Cancelled on the loop when the deadline runs out, releasing its scheduler slot
+    return run_on_llm_loop(arephrase_query(chat_history, query, temperature), deadline.wait_timeout() if deadline else None)
+
+async def arephrase_query(chat_history, query, temperature=0.2):
     try:
         logger.info(f"Sending rephrasing request to LLM with temperature {temperature}")
-        response = client.chat_completion(
-            messages=messages,
-            max_tokens=150,
-            temperature=temperature
+        rephrased_question = await ProviderRouter.for_model(LLM_PROVIDERS[0], "rephrase").generate(
+            build_rephrase_messages(chat_history, query), max_tokens=150, temperature=temperature
         )
         logger.info("Received rephrased query from LLM")
-        rephrased_question = response.choices[0].message.content.strip()
 
         # Remove surrounding quotes if present
         if (rephrased_question.startswith('"') and rephrased_question.endswith('"')) or \
@@ -443,6 +1275,8 @@ Rephrased query:"""
 
         logger.info(f"Rephrased Query (cleaned): {rephrased_question}")
         return rephrased_question
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         logger.error(f"Error rephrasing query with LLM: {e}")
         return query  # Fallback to original query if rephrasing fails
@@ -561,9 +1395,9 @@ def rerank_documents_with_priority(query: str, documents: List[Dict], entity_dom
         bm25_scores = bm25.get_scores(query)
         
         # Step 4: Get semantic similarity scores
-        query_embedding = similarity_model.encode(query, convert_to_tensor=True)
+        query_embedding = encode_texts(query, convert_to_tensor=True)
         doc_summaries = [doc['summary'] for doc in documents]
-        doc_embeddings = similarity_model.encode(doc_summaries, convert_to_tensor=True)
+        doc_embeddings = encode_texts(doc_summaries, convert_to_tensor=True)
         semantic_scores = util.cos_sim(query_embedding, doc_embeddings)[0]
         
         # Step 5: Combine scores (normalize first)
@@ -573,34 +1407,32 @@ def rerank_documents_with_priority(query: str, documents: List[Dict], entity_dom
         # Combine scores with weights (0.4 for BM25, 0.6 for semantic similarity)
         combined_scores = 0.4 * bm25_scores_norm + 0.6 * semantic_scores_norm.numpy()
         
-        # Create scored documents with combined scores
-        scored_documents = list(zip(documents, combined_scores))
+        # Create scored documents with combined scores, keeping each summary embedding for the similarity filter
+        scored_documents = list(zip(documents, combined_scores, doc_embeddings))
         
         # Sort by domain priority and combined score
         scored_documents.sort(key=lambda x: (not x[0]['is_entity_domain'], -x[1]), reverse=False)
         
         # Filter similar documents
         filtered_docs = []
-        added_contents = []
-        
-        for doc, score in scored_documents:
+        added_embeddings = []
+
+        for doc, score, doc_embedding in scored_documents:
             if score < 0.3:  # Minimum relevance threshold
                 continue
-                
+
             # Check similarity with already selected documents
-            doc_embedding = similarity_model.encode(doc['summary'], convert_to_tensor=True)
             is_similar = False
-            
-            for content in added_contents:
-                content_embedding = similarity_model.encode(content, convert_to_tensor=True)
+
+            for content_embedding in added_embeddings:
                 similarity = util.pytorch_cos_sim(doc_embedding, content_embedding)
                 if similarity > similarity_threshold:
                     is_similar = True
                     break
-            
+
             if not is_similar:
                 filtered_docs.append(doc)
-                added_contents.append(doc['summary'])
+                added_embeddings.append(doc_embedding)
             
             if len(filtered_docs) >= max_results:
                 break
@@ -612,10 +1444,138 @@ def rerank_documents_with_priority(query: str, documents: List[Dict], entity_dom
         logger.error(f"Error during reranking documents: {e}")
         return documents[:max_results]  # Fallback to first max_results documents if reranking fails
 
+# Near-duplicate detection on scraped text with 64-bit SimHash fingerprints over word shingles.
+# Mirrors and syndicated copies are collapsed right after scraping, before any LLM or encoder work.
+SIMHASH_SHINGLE_SIZE = 4
+SIMHASH_MAX_DISTANCE = min(max(int(os.getenv("SIMHASH_MAX_DISTANCE", "3")), 0), 15)  # bits; more would match unrelated pages
+SIMHASH_INDEX_SIZE = int(os.getenv("SIMHASH_INDEX_SIZE", "10000"))
+
+def simhash(text: str, shingle_size: int = SIMHASH_SHINGLE_SIZE) -> int:
+    """
+    Compute a 64-bit SimHash fingerprint of a text
+
+    Args:
+        text: Document text
+        shingle_size: Number of consecutive words per shingle
+
+    Returns:
+        Fingerprint as an int; near-duplicate texts differ in only a few bits
+    """
+    words = re.findall(r"\w+", text.lower())
+    shingles = Counter(" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1)))
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big") for shingle in shingles],
+        dtype=np.uint64
+    )
+    counts = np.array(list(shingles.values()), dtype=np.int64)
+    bits = ((hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)).astype(np.int64)
+    weights = ((bits * 2 - 1) * counts[:, None]).sum(axis=0)
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+def hamming_distance(fingerprint: int, other: int) -> int:
+    return bin(fingerprint ^ other).count("1")
+
+class NearDuplicateIndex:
+    """
+    Process-wide index of SimHash fingerprints, shared across requests, that recognizes
+    pages seen before. Each fingerprint keeps the URL it was first seen at, and lookups
+    only match fingerprints within max_distance of the new one, so a chain of small edits
+    never links two unrelated pages.
+
+    Fingerprints are split into max_distance + 1 bands; two within max_distance bits of
+    each other share at least one band exactly, so lookups only compare those.
+    """
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE, max_size: int = SIMHASH_INDEX_SIZE):
+        self.max_distance = max_distance
+        self.max_size = max_size
+        self.band_width = 64 // (max_distance + 1)
+        self.urls = OrderedDict()  # fingerprint -> first URL seen with it
+        self.bands = [dict() for _ in range(max_distance + 1)]  # band value -> set of fingerprints
+        self.lock = threading.Lock()
+
+    def band_values(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_width) - 1
+        return [(fingerprint >> (band * self.band_width)) & mask for band in range(len(self.bands))]
+
+    def recognize(self, fingerprint: int, url: str) -> Optional[str]:
+        """Index `fingerprint` under `url` and return the URL of a near-duplicate seen before, if any."""
+        with self.lock:
+            known = self.urls.get(fingerprint)
+            if known is None:
+                known = next((
+                    self.urls[candidate]
+                    for band, value in enumerate(self.band_values(fingerprint))
+                    for candidate in self.bands[band].get(value, ())
+                    if hamming_distance(candidate, fingerprint) <= self.max_distance
+                ), None)
+                self.add(fingerprint, url)
+            self.urls.move_to_end(fingerprint)
+            return known
+
+    def add(self, fingerprint: int, url: str):
+        self.urls[fingerprint] = url
+        for band, value in enumerate(self.band_values(fingerprint)):
+            self.bands[band].setdefault(value, set()).add(fingerprint)
+        while len(self.urls) > self.max_size:
+            evicted, _ = self.urls.popitem(last=False)
+            for band, value in enumerate(self.band_values(evicted)):
+                self.bands[band][value].discard(evicted)
+                if not self.bands[band][value]:
+                    del self.bands[band][value]
+
+near_duplicate_index = NearDuplicateIndex()
+
+# Cascade mode: cheap first-pass ranking so only the top candidates reach LLM assessment
+CASCADE_MIN_SCORE = float(os.getenv("CASCADE_MIN_SCORE", "0.3"))
+
+def normalize_scores(scores: np.ndarray) -> np.ndarray:
+    score_range = np.max(scores) - np.min(scores)
+    if score_range == 0:
+        return np.ones_like(scores, dtype=float)
+    return (scores - np.min(scores)) / score_range
+
+def prerank_documents(query: str, documents: List[Dict], entity_domain: str) -> List[Tuple[Dict, float]]:
+    """
+    Rank raw scraped documents with BM25 and embeddings of their content, before any
+    LLM call. Documents from the entity domain come first.
+
+    Args:
+        query: Rephrased search query
+        documents: Scraped documents with 'title', 'url' and 'content'
+        entity_domain: Domain extracted from the query, if any
+
+    Returns:
+        List of (document, combined score) pairs, best first; scores are in [0, 1]
+    """
+    doc_texts, _ = prepare_documents_for_bm25(documents)
+    bm25 = BM25()
+    bm25.fit(doc_texts)
+    bm25_scores = normalize_scores(bm25.get_scores(query))
+
+    query_embedding = encode_texts(query, convert_to_tensor=True)
+    doc_embeddings = encode_texts([doc['content'][:1000] for doc in documents], convert_to_tensor=True)
+    semantic_scores = normalize_scores(util.cos_sim(query_embedding, doc_embeddings)[0].cpu().numpy())
+
+    combined_scores = 0.4 * bm25_scores + 0.6 * semantic_scores
+    ranked = [(doc, float(score)) for doc, score in zip(documents, combined_scores)]
+    ranked.sort(key=lambda x: (urlparse(x[0]['url']).netloc != entity_domain, -x[1]))
+    return ranked
+
+def select_cascade_candidates(ranked: List[Tuple[Dict, float]], top_k: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split pre-ranked documents into the first batch to assess and the rest. The batch holds
+    up to `top_k` documents above CASCADE_MIN_SCORE, topped up with the next best documents
+    when too few clear the cutoff.
+    """
+    confident = [doc for doc, score in ranked if score >= CASCADE_MIN_SCORE][:top_k]
+    rest = [doc for doc, _ in ranked if not any(doc is chosen for chosen in confident)]
+    top_up = rest[:top_k - len(confident)]
+    return confident + top_up, rest[len(top_up):]
+
 def compute_similarity(text1, text2):
     # Encode the texts
-    embedding1 = similarity_model.encode(text1, convert_to_tensor=True)
-    embedding2 = similarity_model.encode(text2, convert_to_tensor=True)
+    embedding1 = encode_texts(text1, convert_to_tensor=True)
+    embedding2 = encode_texts(text2, convert_to_tensor=True)
     
     # Compute cosine similarity
     cosine_similarity = util.pytorch_cos_sim(embedding1, embedding2)
@@ -623,13 +1583,14 @@ def compute_similarity(text1, text2):
     return cosine_similarity.item()
 
 def is_content_unique(new_content, existing_contents, similarity_threshold=0.8):
-    for existing_content in existing_contents:
-        similarity = compute_similarity(new_content, existing_content)
-        if similarity > similarity_threshold:
-            return False
-    return True
-
-def assess_relevance_and_summarize(llm_client, query, document, temperature=0.2):
+    if not existing_contents:
+        return True
+    # One batched encode instead of a pair of encodes per existing content
+    new_embedding = encode_texts(new_content, convert_to_tensor=True)
+    existing_embeddings = encode_texts(existing_contents, convert_to_tensor=True)
+    return util.cos_sim(new_embedding, existing_embeddings).max().item() <= similarity_threshold
+
+def build_assessment_messages(query, document):
     system_prompt = """You are a world-class AI assistant specializing in news analysis. Your task is to assess the relevance of a given document to a user's query and provide a detailed summary if it's relevant."""
 
     user_prompt = f"""
@@ -656,49 +1617,258 @@ Summary: [Your detailed summary if relevant, or "Not relevant" if not]
 Remember to focus on key aspects and implications in your assessment and summary. Aim to make the summary distinctive, highlighting what makes this particular news item unique compared to similar news.
 """
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
+async def aassess_relevance_and_summarize(ai_model: AsyncAIModel, query, document, temperature=0.2):
     try:
-        response = llm_client.chat_completion(
-            messages=messages,
-            max_tokens=300,  # Increased to allow for more detailed summaries
+        return await ai_model.generate(
+            messages=build_assessment_messages(query, document),
+            max_tokens=300,
             temperature=temperature,
+            provider_options={"mistral": {"frequency_penalty": None}},
             top_p=0.9,
             frequency_penalty=1.4
         )
-        return response.choices[0].message.content.strip()
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         logger.error(f"Error assessing relevance and summarizing with LLM: {e}")
         return "Error: Unable to assess relevance and summarize"
 
+def iter_assessments(query, documents, temperature, deadline: Deadline) -> Iterator[Tuple[int, Optional[str]]]:
+    """
+    Assess all documents concurrently on the shared LLM loop.
+
+    Yields (index, assessment) pairs in completion order. Assessments still running when
+    the deadline runs out are cancelled and yielded with None.
+    """
+    ai_model = ProviderRouter.for_model(LLM_PROVIDERS[0], "assessment")
+    loop = get_llm_loop()
+    futures = {
+        asyncio.run_coroutine_threadsafe(aassess_relevance_and_summarize(ai_model, query, doc, temperature), loop): index
+        for index, doc in enumerate(documents)
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline.wait_timeout()):
+            pending.discard(future)
+            yield futures[future], future.result()
+    except FutureTimeoutError:
+        deadline.mark_cut_short()
+        for future in pending:
+            future.cancel()
+        for future in sorted(pending, key=futures.get):
+            yield futures[future], None
+    finally:
+        # The consumer may stop early; don't leave requests running for nobody
+        for future in pending:
+            future.cancel()
+
+def assess_documents(query, documents, temperature, deadline: Deadline) -> List[Optional[str]]:
+    """
+    Assess all documents concurrently on the shared LLM loop.
+
+    Returns one assessment per document, or None for documents whose assessment was
+    still running when the deadline ran out (those requests are cancelled).
+    """
+    assessments = [None] * len(documents)
+    for index, assessment in iter_assessments(query, documents, temperature, deadline):
+        assessments[index] = assessment
+    return assessments
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds (0 disables it)."""
+    def __init__(self, max_size: int = 512, ttl: float = 600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+# Scraped pages are shared between concurrent and batched requests
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "600"))
+SCRAPE_CACHE_SIZE = int(os.getenv("SCRAPE_CACHE_SIZE", "512"))
+scrape_cache = TTLCache(max_size=SCRAPE_CACHE_SIZE, ttl=SCRAPE_CACHE_TTL)
+
 def scrape_full_content(url, max_chars=3000, timeout=5, use_pydf2=True):
+    content, _ = scrape_document(url, max_chars, timeout, use_pydf2)
+    return content
+
+def scrape_document(url, max_chars=3000, timeout=5, use_pydf2=True) -> Tuple[Optional[str], str]:
+    """
+    Scrape a page, reusing cached content and sharing identical in-flight fetches.
+
+    Returns (content, scraper): content is None when the document was skipped (PDFs with
+    use_pydf2 disabled, unsupported or oversized bodies) and "" when scraping failed.
+    """
+    cache_key = (url, max_chars, use_pydf2)
+    cached = scrape_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Using cached content for: {url}")
+        return cached
+
+    return scrape_flight.do(cache_key, fetch_and_cache_document, url, max_chars, timeout, use_pydf2)
+
+def fetch_and_cache_document(url, max_chars, timeout, use_pydf2):
+    content, scraper = fetch_document(url, max_chars, timeout, use_pydf2)
+    if content:
+        scrape_cache.set((url, max_chars, use_pydf2), (content, scraper))
+    return content, scraper
+
+# Fetch-time routing: only the headers and the first chunk decide how a body is handled
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", str(10 * 1024 * 1024)))
+SNIFF_BYTES = 4096
+SCRAPER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/pdf;q=0.9,*/*;q=0.8',
+}
+
+# Leading bytes of binary formats that can never produce text
+BINARY_SIGNATURES = (
+    b"\x89PNG", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"RIFF", b"II*\x00", b"MM\x00*",
+    b"PK\x03\x04", b"\x1f\x8b", b"7z\xbc\xaf", b"Rar!", b"ID3", b"OggS", b"fLaC", b"\x1aE\xdf\xa3",
+    b"\x7fELF", b"\x00\x00\x01\x00",
+)
+HTML_MARKERS = (b"<!doctype html", b"<html", b"<head", b"<body", b"<meta", b"<title")
+
+def sniff_content_kind(content_type: str, head: bytes) -> str:
+    """
+    Decide how to extract a response from its Content-Type header and leading bytes.
+    Magic bytes win over the header, since servers often mislabel downloads.
+
+    Returns:
+        "pdf", "html" or "unsupported"
+    """
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(BINARY_SIGNATURES) or head[4:8] == b"ftyp":
+        return "unsupported"
+
+    start = head.lstrip(b"\xef\xbb\xbf \t\r\n")[:1024].lower()
+    if any(marker in start for marker in HTML_MARKERS):
+        return "html"
+
+    mime = content_type.split(";")[0].strip().lower()
+    if mime == "application/pdf":
+        return "pdf"
+    if mime in ("text/html", "application/xhtml+xml") or mime.startswith("text/"):
+        return "html"
+    if not mime and b"\x00" not in head:
+        return "html"
+    return "unsupported"
+
+def read_limited(chunks, first_chunk: bytes, limit: int) -> Optional[bytes]:
+    """Read the rest of a streamed body, or return None as soon as it grows past `limit`."""
+    body = bytearray(first_chunk)
+    for chunk in chunks:
+        body.extend(chunk)
+        if len(body) > limit:
+            return None
+    return bytes(body)
+
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+def html_encoding(response: requests.Response, body: bytes) -> str:
+    """
+    Charset of an HTML body: from the Content-Type header if it names one, else from the
+    page's <meta charset>, else UTF-8 if the bytes are valid UTF-8, else detected.
+    requests reports ISO-8859-1 for any text/html response without a charset, so its
+    `encoding` is only trusted when the header really declares one.
+    """
+    if 'charset=' in response.headers.get('Content-Type', '').lower() and response.encoding:
+        return response.encoding
+    match = META_CHARSET_PATTERN.search(body[:SNIFF_BYTES])
+    if match:
+        declared = match.group(1).decode('ascii')
+        try:
+            codecs.lookup(declared)
+            return declared
+        except LookupError:
+            pass
+    try:
+        body.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return requests.compat.chardet.detect(body)['encoding'] or 'utf-8'
+
+def fetch_document(url, max_chars=3000, timeout=5, use_pydf2=True) -> Tuple[Optional[str], str]:
     try:
         logger.info(f"Scraping full content from: {url}")
-        
-        # Check if the URL ends with .pdf
-        if url.lower().endswith('.pdf'):
-            if use_pydf2:
-                return scrape_pdf_content(url, max_chars, timeout)
-            else:
+
+        with requests.get(url, headers=SCRAPER_HEADERS, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get('Content-Length', '')
+            if content_length.isdigit() and int(content_length) > MAX_DOWNLOAD_BYTES:
+                logger.info(f"Skipping oversized document ({content_length} bytes): {url}")
+                return None, "unsupported"
+
+            chunks = response.iter_content(chunk_size=SNIFF_BYTES)
+            first_chunk = next(chunks, b"")
+            kind = sniff_content_kind(response.headers.get('Content-Type', ''), first_chunk)
+
+            if kind == "unsupported":
+                logger.info(f"Skipping non-text document ({response.headers.get('Content-Type', 'unknown type')}): {url}")
+                return None, kind
+            if kind == "pdf" and not use_pydf2:
                 logger.info(f"Skipping PDF document: {url}")
-                return None
-        
-        # Use Newspaper3k for non-PDF content
-        content = scrape_with_newspaper(url)
-        
+                return None, kind
+
+            body = read_limited(chunks, first_chunk, MAX_DOWNLOAD_BYTES)
+            if body is None:
+                logger.info(f"Aborted download over {MAX_DOWNLOAD_BYTES} bytes: {url}")
+                return None, "unsupported"
+
+            if kind == "pdf":
+                return extract_pdf_text(body, max_chars), "pdf"
+
+            html = body.decode(html_encoding(response, body), errors="replace")
+
+        # Use Newspaper3k on the HTML we already downloaded
+        article = Article(url)
+        article.download(input_html=html)
+        article.parse()
+        content = article_to_text(article)
+
         # Limit the content to max_chars
-        return content[:max_chars] if content else ""
+        return (content[:max_chars] if content else ""), "newspaper"
     except requests.Timeout:
         logger.error(f"Timeout error while scraping full content from {url}")
-        return ""
+        return "", "newspaper"
     except Exception as e:
         logger.error(f"Error scraping full content from {url}: {e}")
-        return ""
+        return "", "newspaper"
+
+# Sampling parameters each provider has been tuned with for the final summary
+SUMMARY_PROVIDER_OPTIONS = {
+    "huggingface": {"frequency_penalty": 1.4},
+    "groq": {"max_tokens": 5500, "presence_penalty": 1.2},
+}
 
-def llm_summarize(json_input, model, temperature=0.2):
+def llm_summarize(json_input, model, temperature=0.2, deadline: Optional[Deadline] = None):
     system_prompt = """You are Sentinel, a world-class AI model who is expert at searching the web and answering user's queries. You are also an expert at summarizing web pages or documents and searching for content in them."""
     user_prompt = f"""
 Please provide a comprehensive summary based on the following JSON input:
@@ -723,41 +1893,552 @@ Instructions:
         {"role": "user", "content": user_prompt}
     ]
     try:
-        if model == "groq":
-            response = groq_client.chat.completions.create(
-                messages=messages,
-                model="llama-3.1-70b-versatile",
-                max_tokens=5500,
-                temperature=temperature,
-                top_p=0.9,
-                presence_penalty=1.2,
-                stream=False
-            )
-            return response.choices[0].message.content.strip()
-        elif model == "mistral":
-            response = mistral_client.chat.complete(
-                model="open-mistral-nemo",
-                messages=messages,
-                max_tokens=10000,
-                temperature=temperature,
-                top_p=0.9,
-                stream=False
-            )
-            return response.choices[0].message.content.strip()
-        else:  # huggingface
-            response = client.chat_completion(
-                messages=messages,
-                max_tokens=10000,
-                temperature=temperature,
-                frequency_penalty=1.4,
-                top_p=0.9
-            )
-            return response.choices[0].message.content.strip()
+        return run_on_llm_loop(ProviderRouter.for_model(model, "summary").generate(
+            messages,
+            max_tokens=10000,
+            temperature=temperature,
+            timeout=LLM_SUMMARY_TIMEOUT,
+            provider_options=SUMMARY_PROVIDER_OPTIONS,
+            top_p=0.9
+        ), deadline.wait_timeout() if deadline else None)
+    except FutureTimeoutError:
+        raise  # the deadline ran out; run_with_deadline substitutes its fallback
     except Exception as e:
         logger.error(f"Error in LLM summarization: {e}")
         return "Error: Unable to generate a summary. Please try again."
 
-def search_and_scrape(
+# Map-reduce summarization for large inputs: groups of documents are summarized concurrently
+# into partial answers with citations, then merged by one short reduce call. Used instead of
+# llm_summarize when the single prompt would exceed MAP_REDUCE_MIN_TOKENS.
+MAP_REDUCE_MIN_TOKENS = int(os.getenv("MAP_REDUCE_MIN_TOKENS", "6000"))
+MAP_REDUCE_GROUP_TOKENS = int(os.getenv("MAP_REDUCE_GROUP_TOKENS", "3000"))
+MAP_MAX_TOKENS = 1000
+REDUCE_MAX_TOKENS = 4000
+
+def use_map_reduce(json_input: str, documents: List[Dict]) -> bool:
+    return len(documents) > 1 and estimate_tokens(json_input) > MAP_REDUCE_MIN_TOKENS
+
+def group_documents(documents: List[Dict], max_tokens: int) -> List[List[Tuple[int, Dict]]]:
+    """
+    Pack documents in rank order into groups of at most `max_tokens`, keeping each one's
+    1-based citation number. A document over the budget alone gets its full content trimmed.
+    """
+    groups, group, group_tokens = [], [], 0
+    for number, doc in enumerate(documents, start=1):
+        doc = {"number": number, "title": doc['title'], "url": doc['url'], "summary": doc['summary'], "full_content": doc['full_content']}
+        tokens = estimate_tokens(json.dumps(doc))
+        if tokens > max_tokens:
+            doc["full_content"] = truncate_to_tokens(doc["full_content"], max(max_tokens - (tokens - estimate_tokens(doc["full_content"])), 0))
+            tokens = max_tokens
+        if group and group_tokens + tokens > max_tokens:
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append((number, doc))
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+def map_reduce_summarize(query: str, documents: List[Dict], model: str, temperature: float = 0.2, deadline: Optional[Deadline] = None) -> str:
+    """
+    Summarize many documents concurrently (map) and merge the partial answers (reduce),
+    keeping the [number](url) citations of the single-pass summary.
+
+    Args:
+        documents: Ranked documents with 'title', 'url', 'summary' and 'full_content'; a
+            document's citation number is its 1-based position.
+        deadline: Budget for the LLM calls; calls still running when it runs out are cancelled.
+    """
+    system_prompt = """You are Sentinel, a world-class AI model who is expert at searching the web and answering user's queries. You are also an expert at summarizing web pages or documents and searching for content in them."""
+    groups = group_documents(documents, MAP_REDUCE_GROUP_TOKENS)
+    # The map calls have their own, smaller max_tokens
+    map_options = {provider: {name: value for name, value in options.items() if name != "max_tokens"} for provider, options in SUMMARY_PROVIDER_OPTIONS.items()}
+    logger.info(f"Map-reduce summarization of {len(documents)} documents in {len(groups)} groups")
+
+    def map_messages(group):
+        user_prompt = f"""
+Query: {query}
+
+Documents:
+{json.dumps([doc for _, doc in group])}
+
+Instructions:
+1. Write the part of a research answer to the query that these documents support, using only these documents.
+2. Include every relevant fact, figure, date and name. Be concise; bullet points are fine. No introduction or conclusion.
+3. Cite each statement with the document's number and URL in the form [number](url), for example [3](https://example.com), at the end of the sentence.
+4. If none of the documents is relevant to the query, reply only with "No relevant information"."""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    async def map_all():
+        router = ProviderRouter.for_model(model, "summary_map")
+        return await asyncio.gather(*[
+            router.generate(map_messages(group), max_tokens=MAP_MAX_TOKENS, temperature=temperature, provider_options=map_options, top_p=0.9)
+            for group in groups
+        ], return_exceptions=True)
+
+    partials = []
+    for group, partial in zip(groups, run_on_llm_loop(map_all(), deadline.wait_timeout() if deadline else None)):
+        if isinstance(partial, Exception):
+            logger.error(f"Error in map summarization of documents {[number for number, _ in group]}: {partial}")
+            # Fall back to the relevance summaries of this group's documents
+            partial = "\n".join(f"- {doc['title']}: {doc['summary']} [{number}]({doc['url']})" for number, doc in group)
+        if partial.strip().lower().rstrip(".") != "no relevant information":
+            partials.append(partial)
+
+    if not partials:
+        # Nothing for the reduce step to merge; asking it anyway invites an uncited answer
+        logger.info("No map summary found relevant information, skipping the reduce step")
+        return f"None of the sources found for \"{query}\" contain information relevant to the query."
+    if len(partials) == 1:
+        return partials[0]
+
+    user_prompt = f"""
+Query: {query}
+
+Partial answers, each written from a different subset of the sources:
+{chr(10).join(f"--- Part {index} ---{chr(10)}{partial}" for index, partial in enumerate(partials, start=1))}
+
+Instructions:
+1. Merge the partial answers into one detailed, complete and well-structured research answer to the query.
+2. Keep every citation exactly as written, in the form [number](url), next to the statement it supports. Do not renumber, merge or invent citations.
+3. Remove repetition between the parts and resolve the order of events logically.
+4. Use an unbiased and journalistic tone. You can use markdown and bullet points."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    try:
+        return run_on_llm_loop(ProviderRouter.for_model(model, "summary").generate(
+            messages,
+            max_tokens=REDUCE_MAX_TOKENS,
+            temperature=temperature,
+            timeout=LLM_SUMMARY_TIMEOUT,
+            provider_options=map_options,
+            top_p=0.9
+        ), deadline.wait_timeout() if deadline else None)
+    except FutureTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in reduce summarization: {e}")
+        # The partial answers already carry their citations
+        return "\n\n".join(partials)
+
+def summarize_without_llm(query, documents):
+    """
+    Build an answer directly from the gathered documents, used when the request deadline
+    leaves no time for the final LLM summarization.
+    """
+    lines = [f"I ran out of time to write a full answer for \"{query}\". Here is what the sources gathered so far say:\n"]
+    for index, doc in enumerate(documents, start=1):
+        lines.append(f"- **{doc['title']}**: {doc['summary']} [{index}]({doc['url']})")
+    return "\n".join(lines)
+
+# Query parameters that only record where a click came from and never change the page
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "ref", "ref_src", "ref_url", "cmpid", "icid", "ocid", "smid", "amp",
+}
+TRACKING_PARAM_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_", "__hs")
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a result URL so that variants of the same article compare equal: scheme,
+    www/m/amp host prefixes, default ports, tracking parameters, fragments, trailing
+    slashes and AMP page or cache variants.
+    """
+    try:
+        parsed = urlparse(url.strip())
+        host = (parsed.hostname or "").lower()
+        port = parsed.port
+    except ValueError:
+        return url
+
+    # AMP caches wrap the original URL: google.com/amp/s/<url> and <host>.cdn.ampproject.org/c/s/<url>
+    if host in ("google.com", "www.google.com") and parsed.path.startswith("/amp/"):
+        target = parsed.path[len("/amp/"):]
+        return canonicalize_url("https://" + (target[2:] if target.startswith("s/") else target))
+    if host.endswith(".cdn.ampproject.org"):
+        match = re.match(r"^/[a-z]+/(?:s/)?(.+)$", parsed.path)
+        if match:
+            return canonicalize_url("https://" + match.group(1))
+
+    for prefix in ("www.", "m.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+
+    path = parsed.path
+    path = re.sub(r"^/amp(?=/)", "", path)
+    path = re.sub(r"/amp/?$", "", path)
+    path = re.sub(r"\.amp(?=\.html?$|$)", "", path)
+    path = path.rstrip("/") or "/"
+
+    query_params = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+        and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+        and not (key == "outputType" and value == "amp")
+    ]
+    return urlunparse(("https", netloc, path, "", urlencode(sorted(query_params)), ""))
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """
+    Merge several ranked SearXNG result lists with reciprocal rank fusion.
+
+    Args:
+        ranked_lists: Result lists, each in the order its engine returned them
+        k: Rank smoothing constant, 60 as in the original RRF paper
+
+    Returns:
+        One list of results, deduplicated by canonical URL and ordered by fused score
+    """
+    scores = {}
+    first_seen = {}
+    for results in ranked_lists:
+        seen_in_list = set()
+        for rank, result in enumerate(results, start=1):
+            key = canonicalize_url(result.get('url', ''))
+            if key in seen_in_list:
+                continue
+            seen_in_list.add(key)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            first_seen.setdefault(key, result)
+    return [first_seen[key] for key in sorted(scores, key=lambda key: -scores[key])]
+
+def searxng_search(params: Dict, headers: Dict, method: str, timeout: float) -> List[Dict]:
+    session = requests_retry_session()
+    if method.upper() == "GET":
+        response = session.get(SEARXNG_URL, params=params, headers=headers, timeout=timeout, verify=certifi.where())
+    else:  # POST
+        response = session.post(SEARXNG_URL, data=params, headers=headers, timeout=timeout, verify=certifi.where())
+    response.raise_for_status()
+
+    search_results = response.json()
+    logger.debug(f"SearXNG Response: {search_results}")
+    return search_results.get('results', [])
+
+# Worker pool for concurrent per-engine SearXNG requests
+SEARXNG_FANOUT_WORKERS = int(os.getenv("SEARXNG_FANOUT_WORKERS", "8"))
+searxng_executor = ThreadPoolExecutor(max_workers=SEARXNG_FANOUT_WORKERS, thread_name_prefix="searxng")
+
+def fanout_searxng_search(params: Dict, headers: Dict, engine_groups: List[str], method: str, deadline: Deadline) -> List[Dict]:
+    """
+    Query SearXNG once per engine group concurrently and fuse the rankings.
+
+    Each entry of `engine_groups` is sent as the `engines` parameter of its own request, so
+    an entry such as "google,bing" queries that group together. Failed groups are skipped;
+    if every group fails the last error is raised.
+    """
+    futures = {
+        searxng_executor.submit(contextvars.copy_context().run, run_for_request, searxng_search, {**params, 'engines': group}, headers, method, deadline.timeout(10)): group
+        for group in engine_groups
+    }
+    done, not_done = wait(futures, timeout=deadline.wait_timeout())
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        deadline.mark_cut_short()
+
+    ranked_lists = []
+    last_error = None
+    for future in futures:
+        if future not in done:
+            continue
+        try:
+            ranked_lists.append(future.result())
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error during SearXNG request for engines '{futures[future]}': {e}")
+            last_error = e
+    if not ranked_lists and last_error is not None:
+        raise last_error
+
+    fused = reciprocal_rank_fusion(ranked_lists)
+    logger.info(f"Fused {sum(len(results) for results in ranked_lists)} results from {len(ranked_lists)} engine groups into {len(fused)}")
+    return fused
+
+# Headers for SearXNG requests
+SEARXNG_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/javascript, */*; q=0.01',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Origin': 'https://shreyas094-searxng-local.hf.space',
+    'Referer': 'https://shreyas094-searxng-local.hf.space/',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin',
+}
+
+def build_search_params(query: str, time_range: str, language: str, category: str, engines: List[str], safesearch: int) -> Dict:
+    # Search query parameters
+    params = {
+        'q': query,
+        'format': 'json',
+        'time_range': time_range,
+        'language': language,
+        'category': category,
+        'engines': ','.join(engines),
+        'safesearch': safesearch
+    }
+
+    # Remove empty parameters
+    params = {k: v for k, v in params.items() if v != ""}
+
+    # If no engines are specified, set default engines
+    if 'engines' not in params:
+        params['engines'] = 'google'  # Default to 'google' or any preferred engine
+        logger.info("No engines specified. Defaulting to 'google'.")
+    return params
+
+def search_searxng_page(params: Dict, headers: Dict, engines: List[str], method: str, fanout_engines: bool, deadline: Deadline) -> List[Dict]:
+    """One page of SearXNG results, from each engine separately and fused when fan-out is on."""
+    engine_groups = engines or [params['engines']]
+    if fanout_engines and len(engine_groups) > 1:
+        return fanout_searxng_search(params, headers, engine_groups, method, deadline)
+    return searxng_search(params, headers, method, deadline.timeout(10))
+
+@dataclass
+class SearchResult:
+    """Outcome of one pass through the pipeline, as returned to the UI and the HTTP API."""
+    query: str
+    answer: str = ""
+    query_type: str = "web_search"
+    rephrased_query: str = ""
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    cut_short: List[str] = field(default_factory=list)
+    speculation: Dict[str, str] = field(default_factory=dict)
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - started, 3)
+
+# On-demand profiling. A request is profiled when it asks for it, when PROFILE_REQUESTS is
+# set, or when it is picked by PROFILE_SAMPLE_RATE. Each capture writes a profile plus a JSON
+# file with the query and stage timings; index.json lists the slowest captures.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")  # "sampling" (collapsed stacks) or "cprofile" (pstats)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INDEX_SIZE = int(os.getenv("PROFILE_INDEX_SIZE", "50"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+profile_index_lock = threading.Lock()
+
+class SamplingProfiler:
+    """
+    Samples Python stacks at a fixed interval and counts collapsed stacks: the stack of
+    `thread_id` and of every thread in `workers`.
+    """
+    def __init__(self, thread_id: Optional[int], interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.workers = set()
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            thread_ids = list(self.workers)
+            if self.thread_id is not None:
+                thread_ids.append(self.thread_id)
+            if not thread_ids:
+                continue
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def should_profile(requested: bool) -> bool:
+    return requested or PROFILE_REQUESTS or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+def update_profile_index(entry: Dict[str, Any]):
+    """Add a capture to index.json, keeping the PROFILE_INDEX_SIZE slowest and deleting the rest."""
+    index_path = os.path.join(PROFILE_DIR, "index.json")
+    with profile_index_lock:
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = []
+        index.append(entry)
+        index.sort(key=lambda item: -item["duration"])
+        for dropped in index[PROFILE_INDEX_SIZE:]:
+            for name in (dropped["profile"], dropped["metadata"]):
+                try:
+                    os.remove(os.path.join(PROFILE_DIR, name))
+                except OSError:
+                    pass
+        index = index[:PROFILE_INDEX_SIZE]
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(index_path + ".tmp", index_path)
+
+# The profiler of the request whose work runs in this context, if it is being profiled
+profiled_request: contextvars.ContextVar = contextvars.ContextVar("profiled_request", default=None)
+
+def run_for_request(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run stage work for a request on a worker thread, in a copy of the request's context.
+    The thread is profiled while it runs if the request is being profiled.
+    """
+    profiler = profiled_request.get()
+    if profiler is None:
+        return func(*args, **kwargs)
+    with profiler.worker():
+        return func(*args, **kwargs)
+
+class RequestProfiler:
+    """
+    Profile of one request that may run across several threads, as a streamed request
+    does when each step of its generator is resumed by whichever worker is free. Wrap each
+    step in resume()/pause() and call finish() once at the end. Worker threads that run
+    stage work for the request through `run_for_request` are profiled as well.
+    """
+    def __init__(self, query: str):
+        self.query = query
+        self.capture_id = f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.started = time.perf_counter()
+        self.worker_profiles = []
+        if PROFILE_MODE == "cprofile":
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = SamplingProfiler(None)
+            self.profiler.start()
+
+    def resume(self):
+        self.context_token = profiled_request.set(self)
+        if PROFILE_MODE == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.thread_id = threading.get_ident()
+
+    def pause(self):
+        if PROFILE_MODE == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.thread_id = None
+        profiled_request.reset(self.context_token)
+
+    @contextmanager
+    def worker(self):
+        """Profile the current worker thread while it runs work for this request."""
+        if PROFILE_MODE == "cprofile":
+            # cProfile only sees the thread it was enabled on, so each worker gets its own
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                self.worker_profiles.append(profile)
+        else:
+            thread_id = threading.get_ident()
+            self.profiler.workers.add(thread_id)
+            try:
+                yield
+            finally:
+                self.profiler.workers.discard(thread_id)
+
+    def finish(self, timings: Dict[str, float]):
+        duration = round(time.perf_counter() - self.started, 3)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if PROFILE_MODE == "cprofile":
+            profile_name = f"{self.capture_id}.pstats"
+            stats = pstats.Stats()
+            for profile in [self.profiler, *self.worker_profiles]:
+                profile.create_stats()
+                if profile.stats:
+                    stats.add(profile)
+            stats.dump_stats(os.path.join(PROFILE_DIR, profile_name))
+        else:
+            self.profiler.stop()
+            profile_name = f"{self.capture_id}.collapsed"
+            self.profiler.dump(os.path.join(PROFILE_DIR, profile_name))
+
+        entry = {
+            "id": self.capture_id,
+            "query": self.query,
+            "duration": duration,
+            "mode": PROFILE_MODE,
+            "profile": profile_name,
+            "metadata": f"{self.capture_id}.json",
+        }
+        with open(os.path.join(PROFILE_DIR, entry["metadata"]), "w") as f:
+            json.dump({**entry, "timings": timings}, f, indent=2)
+        update_profile_index(entry)
+        logger.info(f"Saved {PROFILE_MODE} profile of request '{self.query}' ({duration}s) to {profile_name}")
+
+def iter_profiled(requested: bool, events: Iterator[Dict[str, Any]], query: str) -> Iterator[Dict[str, Any]]:
+    """
+    Pass a pipeline event stream through, capturing a profile of the work done for each
+    event when profiling applies to this request.
+    """
+    if not should_profile(requested):
+        yield from events
+        return
+
+    profiler = RequestProfiler(query)
+    timings = {}
+    try:
+        while True:
+            profiler.resume()
+            try:
+                event = next(events)
+            except StopIteration:
+                break
+            finally:
+                profiler.pause()
+            if event["type"] == "result":
+                timings = event["result"].timings
+            yield event
+    finally:
+        profiler.finish(timings)
+
+def search_and_scrape(*args, **kwargs) -> str:
+    """Run the web search pipeline and return only the answer text. See `run_search`."""
+    return run_search(*args, **kwargs).answer
+
+def search_event(event_type: str, **data) -> Dict[str, Any]:
+    return {"type": event_type, **data}
+
+def run_search(*args, **kwargs) -> SearchResult:
+    """Run the web search pipeline to completion; takes the arguments of `iter_search_events`."""
+    return drain_search_events(iter_search_events(*args, **kwargs))
+
+def drain_search_events(events: Iterator[Dict[str, Any]]) -> SearchResult:
+    for event in events:
+        if event["type"] == "result":
+            return event["result"]
+
+def iter_search_events(
     query: str,
     chat_history: str,
     ai_model: AIModel,
@@ -772,114 +2453,156 @@ def search_and_scrape(
     llm_temperature: float = 0.2,
     timeout: int = 5,
     model: str = "huggingface",
-    use_pydf2: bool = True
-):
+    use_pydf2: bool = True,
+    deadline_seconds: float = 0,
+    deadline: Optional[Deadline] = None,
+    fanout_engines: bool = False,
+    cascade: bool = False,
+    cascade_top_k: int = 0,
+    speculation: Optional[Speculation] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run the web search pipeline as a stream of progress events: "rephrased",
+    "search_results", "scraped", "assessed", "ranked" and "status", and always a final
+    "result" event carrying the SearchResult.
+
+    With `speculation`, the "rephrase" branch replaces the rephrasing call and the
+    "search" branch (first page for the raw query) replaces the first search when
+    rephrasing kept the query; otherwise it is dropped.
+    """
+    # One budget for the whole request; each stage below takes its share of what is left
+    deadline = deadline or Deadline(deadline_seconds)
+    result = SearchResult(query=query, cut_short=deadline.cut_short)
+    started = time.perf_counter()
+
+    def finish():
+        result.timings["total"] = round(time.perf_counter() - started, 3)
+        return search_event("result", result=result)
+
     try:
         # Step 1: Rephrase the Query
-        rephrased_query = rephrase_query(chat_history, query, temperature=llm_temperature)
+        with stage_timer(result.timings, "rephrase"):
+            if speculation is not None and "rephrase" in speculation:
+                rephrased_query = speculation.result("rephrase", deadline.stage("rephrase"), query)
+            else:
+                rephrase_stage = deadline.stage("rephrase")
+                rephrased_query = run_with_deadline(rephrase_stage, query, rephrase_query, chat_history, query, llm_temperature, rephrase_stage)
         logger.info(f"Rephrased Query: {rephrased_query}")
+        result.rephrased_query = rephrased_query
+        yield search_event("rephrased", query=rephrased_query)
 
         if not rephrased_query or rephrased_query.lower() == "not_needed":
             logger.info("No need to perform search based on the rephrased query.")
-            return "No search needed for the provided input."
+            result.answer = "No search needed for the provided input."
+            yield finish()
+            return
 
         # Step 2: Extract entity domain
         entity_domain = extract_entity_domain(rephrased_query)
         logger.info(f"Extracted entity domain: {entity_domain}")
 
         # Step 3: Perform search
-        # Search query parameters
-        params = {
-            'q': rephrased_query,
-            'format': 'json',
-            'time_range': time_range,
-            'language': language,
-            'category': category,
-            'engines': ','.join(engines),
-            'safesearch': safesearch
-        }
-
-        # Remove empty parameters
-        params = {k: v for k, v in params.items() if v != ""}
-
-        # If no engines are specified, set default engines
-        if 'engines' not in params:
-            params['engines'] = 'google'  # Default to 'google' or any preferred engine
-            logger.info("No engines specified. Defaulting to 'google'.")
-
-        # Headers for SearXNG request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/javascript, */*; q=0.01',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Origin': 'https://shreyas094-searxng-local.hf.space',
-            'Referer': 'https://shreyas094-searxng-local.hf.space/',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-        }
+        params = build_search_params(rephrased_query, time_range, language, category, engines, safesearch)
+        headers = SEARXNG_HEADERS
 
+        scrape_started = time.perf_counter()
+        scrape_stage = deadline.stage("search_and_scrape")
         scraped_content = []
+        seen_urls = set()
+        kept_fingerprints = []  # (fingerprint, url) of the pages kept so far
         page = 1
         while len(scraped_content) < num_results:
+            if scrape_stage.expired():
+                scrape_stage.mark_cut_short()
+                break
+
             # Update params with current page
             params['pageno'] = page
 
             # Send request to SearXNG
             logger.info(f"Sending request to SearXNG for query: {rephrased_query} (Page {page})")
-            session = requests_retry_session()
-
             try:
-                if method.upper() == "GET":
-                    response = session.get(SEARXNG_URL, params=params, headers=headers, timeout=10, verify=certifi.where())
-                else:  # POST
-                    response = session.post(SEARXNG_URL, data=params, headers=headers, timeout=10, verify=certifi.where())
-                
-                response.raise_for_status()
+                results = None
+                if page == 1 and speculation is not None and "search" in speculation:
+                    # The first page for the raw query only stands in for this search if
+                    # rephrasing kept the query; otherwise it would change what gets scraped
+                    if same_query(rephrased_query, query):
+                        try:
+                            results = speculation.result("search", scrape_stage, None)
+                        except requests.exceptions.RequestException as e:
+                            logger.error(f"Error during speculative SearXNG request: {e}")
+                    else:
+                        speculation.drop("search")
+                if results is None:
+                    results = search_searxng_page(params, headers, engines, method, fanout_engines, scrape_stage)
             except requests.exceptions.RequestException as e:
                 logger.error(f"Error during SearXNG request: {e}")
-                return f"An error occurred during the search request: {e}"
-
-            search_results = response.json()
-            logger.debug(f"SearXNG Response: {search_results}")
+                result.answer = f"An error occurred during the search request: {e}"
+                yield finish()
+                return
 
-            results = search_results.get('results', [])
             if not results:
                 logger.warning(f"No more results returned from SearXNG on page {page}.")
                 break
+            yield search_event(
+                "search_results",
+                page=page,
+                count=len(results),
+                results=[{"title": hit.get('title', 'No title'), "url": hit.get('url', '')} for hit in results[:10]]
+            )
 
-            for result in results:
+            for search_result in results:
                 if len(scraped_content) >= num_results:
                     break
-        
-                url = result.get('url', '')
-                title = result.get('title', 'No title')
+                if scrape_stage.expired():
+                    scrape_stage.mark_cut_short()
+                    break
+
+                url = search_result.get('url', '')
+                title = search_result.get('title', 'No title')
         
                 if not is_valid_url(url):
                     logger.warning(f"Invalid URL: {url}")
                     continue
+
+                canonical_url = canonicalize_url(url)
+                if canonical_url in seen_urls:
+                    logger.info(f"Skipping duplicate of an already processed URL: {url}")
+                    continue
+                seen_urls.add(canonical_url)
         
                 try:
                     logger.info(f"Processing content from: {url}")
                     
-                    content = scrape_full_content(url, max_chars, timeout, use_pydf2)
-                    
-                    if content is None:  # This means it's a PDF and use_pydf2 is False
+                    content, scraper = run_with_deadline(scrape_stage, ("", "newspaper"), scrape_document, url, max_chars, scrape_stage.timeout(timeout), use_pydf2)
+
+                    if content is None:  # Skipped: a PDF with use_pydf2 off, or a non-text or oversized body
                         continue
                     
                     if not content:
                         logger.warning(f"Failed to scrape content from {url}")
                         continue
-                    
+
+                    # Compared with this request's pages only, so a page is never dropped for
+                    # resembling one that is not among the sources
+                    fingerprint = simhash(content)
+                    duplicate_of = next((kept_url for kept_fingerprint, kept_url in kept_fingerprints if hamming_distance(kept_fingerprint, fingerprint) <= SIMHASH_MAX_DISTANCE), None)
+                    if duplicate_of is not None:
+                        logger.info(f"Skipping near-duplicate of {duplicate_of}: {url}")
+                        continue
+                    known_as = near_duplicate_index.recognize(fingerprint, canonical_url)
+                    if known_as is not None and known_as != canonical_url:
+                        logger.info(f"Recognized {url} as a copy of {known_as}, seen in an earlier request")
+                    kept_fingerprints.append((fingerprint, url))
+
                     scraped_content.append({
                         "title": title,
                         "url": url,
                         "content": content,
-                        "scraper": "pdf" if url.lower().endswith('.pdf') else "newspaper"
+                        "scraper": scraper
                     })
                     logger.info(f"Successfully scraped content from {url}. Total scraped: {len(scraped_content)}")
+                    yield search_event("scraped", title=title, url=url, scraper=scraper, count=len(scraped_content))
                 except requests.exceptions.RequestException as e:
                     logger.error(f"Error scraping {url}: {e}")
                 except Exception as e:
@@ -887,54 +2610,123 @@ def search_and_scrape(
 
             page += 1
 
+        result.timings["search_and_scrape"] = round(time.perf_counter() - scrape_started, 3)
         if not scraped_content:
             logger.warning("No content scraped from search results.")
-            return "No content could be scraped from the search results."
+            result.answer = "No content could be scraped from the search results."
+            yield finish()
+            return
 
         logger.info(f"Successfully scraped {len(scraped_content)} documents.")
 
          # Step 4: Assess relevance, summarize, and check for uniqueness
+        assessment_started = time.perf_counter()
+        assessment_stage = deadline.stage("assessment")
         relevant_documents = []
         unique_summaries = []
-        for doc in scraped_content:
-            assessment = assess_relevance_and_summarize(client, rephrased_query, doc, temperature=llm_temperature)
-            relevance, summary = assessment.split('\n', 1)
-
-            if relevance.strip().lower() == "relevant: yes":
-                summary_text = summary.replace("Summary: ", "").strip()
-                
-                if is_content_unique(summary_text, unique_summaries):
-                    doc_domain = urlparse(doc['url']).netloc
-                    is_entity_domain = doc_domain == entity_domain
-                    relevant_documents.append({
-                        "title": doc['title'],
-                        "url": doc['url'],
-                        "summary": summary_text,
-                        "scraper": doc['scraper'],
-                        "is_entity_domain": is_entity_domain
-                    })
-                    unique_summaries.append(summary_text)
-                else:
-                    logger.info(f"Skipping similar content: {doc['title']}")
+        unassessed_documents = []
+
+        if not cascade and llm_scheduler.congested(LLM_PROVIDERS[0]):
+            # Backpressure: while the LLM queue is backed up, assess fewer documents
+            cascade = True
+            yield search_event("status", message="The language model is busy, so only the most promising pages are assessed")
+
+        if cascade:
+            # Only the best pre-ranked documents are assessed; more are added in batches
+            # while fewer than half of the batch size turn out relevant
+            top_k = cascade_top_k or max(1, ceil(len(scraped_content) / 2))
+            batch, remaining = select_cascade_candidates(prerank_documents(rephrased_query, scraped_content, entity_domain), top_k)
+            min_relevant = max(1, top_k // 2)
+            logger.info(f"Cascade: assessing {len(batch)} of {len(scraped_content)} pre-ranked documents")
+            yield search_event("status", message=f"Assessing the {len(batch)} most promising of {len(scraped_content)} pages")
+        else:
+            batch, remaining, min_relevant = scraped_content, [], 0
+
+        while batch:
+            # Verdicts are handled in the order they arrive
+            for index, assessment in iter_assessments(rephrased_query, batch, llm_temperature, assessment_stage):
+                doc = batch[index]
+                if assessment is None:
+                    unassessed_documents.append(doc)
+                    continue
+                relevance, _, summary = assessment.partition('\n')
+                is_relevant = relevance.strip().lower() == "relevant: yes"
+                yield search_event("assessed", title=doc['title'], url=doc['url'], relevant=is_relevant)
+
+                if is_relevant:
+                    summary_text = summary.replace("Summary: ", "").strip()
+
+                    if is_content_unique(summary_text, unique_summaries):
+                        doc_domain = urlparse(doc['url']).netloc
+                        is_entity_domain = doc_domain == entity_domain
+                        relevant_documents.append({
+                            "title": doc['title'],
+                            "url": doc['url'],
+                            "summary": summary_text,
+                            "scraper": doc['scraper'],
+                            "is_entity_domain": is_entity_domain
+                        })
+                        unique_summaries.append(summary_text)
+                    else:
+                        logger.info(f"Skipping similar content: {doc['title']}")
+
+            if len(relevant_documents) >= min_relevant or assessment_stage.expired():
+                break
+            batch, remaining = remaining[:top_k], remaining[top_k:]
+            if batch:
+                logger.info(f"Cascade: only {len(relevant_documents)} relevant so far, assessing {len(batch)} more documents")
+                yield search_event("status", message=f"Only {len(relevant_documents)} relevant so far, assessing {len(batch)} more pages")
+
+        if not relevant_documents and unassessed_documents:
+            # Out of time before any verdict came back: fall back to the unassessed documents
+            logger.warning("Assessment cut short, using unassessed scraped documents.")
+            for doc in unassessed_documents:
+                relevant_documents.append({
+                    "title": doc['title'],
+                    "url": doc['url'],
+                    "summary": doc['content'][:500],
+                    "scraper": doc['scraper'],
+                    "is_entity_domain": urlparse(doc['url']).netloc == entity_domain
+                })
 
+        result.timings["assessment"] = round(time.perf_counter() - assessment_started, 3)
         if not relevant_documents:
             logger.warning("No relevant and unique documents found.")
-            return "No relevant and unique news found for the given query."
+            result.answer = "No relevant and unique news found for the given query."
+            yield finish()
+            return
 
         # Step 5: Rerank documents based on similarity to query and prioritize entity domain
-        reranked_docs = rerank_documents_with_priority(rephrased_query, relevant_documents, entity_domain, similarity_threshold=0.95, max_results=num_results)
-        
+        with stage_timer(result.timings, "rerank"):
+            reranked_docs = rerank_documents_with_priority(rephrased_query, relevant_documents, entity_domain, similarity_threshold=0.95, max_results=num_results)
+
         if not reranked_docs:
             logger.warning("No documents remained after reranking.")
-            return "No relevant news found after filtering and ranking."
+            result.answer = "No relevant news found after filtering and ranking."
+            yield finish()
+            return
         
         logger.info(f"Reranked and filtered to top {len(reranked_docs)} unique, related documents.")
+        yield search_event(
+            "ranked",
+            sources=[{"title": doc['title'], "url": doc['url'], "summary": doc['summary']} for doc in reranked_docs[:num_results]]
+        )
 
         # Step 5: Scrape full content for top documents (up to num_results)
-        for doc in reranked_docs[:num_results]:
-            full_content = scrape_full_content(doc['url'], max_chars)
-            doc['full_content'] = full_content
-    
+        full_content_stage = deadline.stage("full_content")
+        with stage_timer(result.timings, "full_content"):
+            for doc in reranked_docs[:num_results]:
+                doc['full_content'] = run_with_deadline(full_content_stage, "", scrape_full_content, doc['url'], max_chars, full_content_stage.timeout(5))
+
+        result.sources = [
+            {
+                "title": doc['title'],
+                "url": doc['url'],
+                "summary": doc['summary'],
+                "scraper": doc['scraper']
+            } for doc in reranked_docs[:num_results]
+        ]
+
         # Prepare JSON for LLM
         llm_input = {
             "query": query,
@@ -948,14 +2740,191 @@ def search_and_scrape(
             ]
         }
 
-        # Step 6: LLM Summarization
-        llm_summary = llm_summarize(json.dumps(llm_input), model, temperature=llm_temperature)
-        
-        return llm_summary
+        # Step 6: LLM Summarization, map-reduce when the input is too large for one prompt
+        summary_input = json.dumps(llm_input)
+        map_reduce = use_map_reduce(summary_input, llm_input["documents"])
+        yield search_event("status", message=f"Writing the answer from {len(llm_input['documents'])} sources" + (" in parallel parts" if map_reduce else ""))
+        summary_stage = deadline.stage("summarization")
+        with stage_timer(result.timings, "summarization"):
+            if map_reduce:
+                llm_summary = run_with_deadline(summary_stage, None, map_reduce_summarize, query, llm_input["documents"], model, llm_temperature, summary_stage)
+            else:
+                llm_summary = run_with_deadline(summary_stage, None, llm_summarize, summary_input, model, llm_temperature, summary_stage)
+        if llm_summary is None:
+            llm_summary = summarize_without_llm(query, reranked_docs[:num_results])
+
+        if deadline.cut_short:
+            llm_summary += f"\n\n_Note: the request deadline was reached; stages cut short: {', '.join(deadline.cut_short)}._"
+
+        result.answer = llm_summary
+        yield finish()
 
     except Exception as e:
         logger.error(f"Unexpected error in search_and_scrape: {e}")
-        return f"An unexpected error occurred during the search and scrape process: {e}"
+        result.answer = f"An unexpected error occurred during the search and scrape process: {e}"
+        yield finish()
+
+class SearchAbandoned(RuntimeError):
+    """The leader of a coalesced search was closed by its consumer before the result."""
+
+def coalesced_search_events(**kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    iter_search_events, shared with an identical request already in flight. Requests
+    match when the query, chat history and every search option are equal. The leader
+    streams every event; followers get a status event and then the leader's result.
+    Each caller gets its own copy of the result. If the leader's client goes away before
+    the result, a waiting follower takes over and runs the search itself.
+    """
+    key = llm_call_key({name: value for name, value in kwargs.items() if name not in ("ai_model", "deadline", "speculation")})
+    joined = False
+    while True:
+        is_leader, future = request_flight.join(key)
+        if is_leader:
+            break
+        if not joined:
+            yield search_event("status", message="Joining an identical search already in progress")
+            joined = True
+        try:
+            shared = future.result()
+        except SearchAbandoned:
+            logger.info("The identical search in progress was abandoned, running it for this request")
+            continue
+        yield search_event("result", result=copy.deepcopy(shared))
+        return
+
+    result = None
+    error = None
+    try:
+        for event in iter_search_events(**kwargs):
+            if event["type"] == "result":
+                result = event["result"]
+                event = search_event("result", result=copy.deepcopy(result))
+            yield event
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if result is not None:
+            request_flight.finish(key, result=result)
+        else:
+            # Closed by its consumer before the result, e.g. a disconnected client
+            request_flight.finish(key, error=error or SearchAbandoned("The identical search in progress was abandoned"))
+
+def coalesced_run_search(**kwargs) -> SearchResult:
+    """run_search, shared with an identical request already in flight (see coalesced_search_events)."""
+    return drain_search_events(coalesced_search_events(**kwargs))
+
+# Conversation context for LLM prompts: the last CHAT_HISTORY_TURNS turns verbatim, older
+# turns folded into a rolling summary, all within CHAT_HISTORY_MAX_TOKENS.
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "4"))
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1500"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " …"
+
+class ConversationContext:
+    """
+    Builds the bounded chat history string sent with every LLM call.
+
+    Summaries are cached under a hash of the exact turns they cover, so each conversation
+    extends its own summary incrementally: when a turn leaves the verbatim window only that
+    turn is folded into the cached summary of the turns before it. The summary the next
+    message will need is prepared in the background while the current one is answered.
+    """
+    def __init__(self, recent_turns: int = CHAT_HISTORY_TURNS, max_tokens: int = CHAT_HISTORY_MAX_TOKENS,
+                 summary_max_tokens: int = CHAT_SUMMARY_MAX_TOKENS):
+        self.recent_turns = recent_turns
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summaries = TTLCache(max_size=2048, ttl=3600)
+        self.flight = SingleFlight("conversation summary")
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+    def format_turns(self, history: List[Tuple[str, str]]) -> List[str]:
+        return [f"user: {user_message}\nassistant: {assistant_message or ''}" for user_message, assistant_message in history]
+
+    def prefix_keys(self, turns: List[str]) -> List[str]:
+        """Chained hashes: keys[i] identifies exactly the first i + 1 turns."""
+        keys = []
+        digest = b""
+        for turn in turns:
+            digest = hashlib.sha256(digest + turn.encode("utf-8")).digest()
+            keys.append(digest.hex())
+        return keys
+
+    def build(self, history: List[Tuple[str, str]], ai_model: AIModel, summarize: bool = True) -> str:
+        """With summarize=False only an already cached summary of older turns is used, so no LLM call is made."""
+        turns = self.format_turns(history)
+        split = max(len(turns) - self.recent_turns, 0)
+        older, recent = turns[:split], turns[split:]
+        keys = self.prefix_keys(turns)
+
+        if not older:
+            summary = ""
+        elif summarize:
+            summary = self.summarize(older, keys[:split], ai_model, "history_summary")
+        else:
+            summary = self.summaries.get(keys[split - 1]) or ""
+        summary = truncate_to_tokens(summary, self.summary_max_tokens)
+
+        # After this message is answered, the current last turn may leave the verbatim window.
+        # Skipped while the provider is backed up; the next message then summarizes inline.
+        next_split = len(turns) + 1 - self.recent_turns
+        if summarize and next_split > split and next_split <= len(turns) and not llm_scheduler.congested(ai_model.provider):
+            self.executor.submit(contextvars.copy_context().run, self.summarize, turns[:next_split], keys[:next_split], ai_model, "history_prefetch")
+
+        # Share what the summary leaves of the budget evenly across the verbatim turns
+        parts = [f"Summary of earlier conversation: {summary}"] if summary else []
+        if recent:
+            turn_budget = max((self.max_tokens - estimate_tokens("\n".join(parts))) // len(recent), 1)
+            parts.extend(truncate_to_tokens(turn, turn_budget) for turn in recent)
+        return "\n".join(parts)
+
+    def summarize(self, turns: List[str], keys: List[str], ai_model: AIModel, call: str) -> str:
+        cached = self.summaries.get(keys[-1])
+        if cached is not None:
+            return cached
+        return self.flight.do(keys[-1], self.extend_summary, turns, keys, ai_model, call)
+
+    def extend_summary(self, turns: List[str], keys: List[str], ai_model: AIModel, call: str) -> str:
+        # Start from the longest prefix that already has a summary
+        previous, start = "", 0
+        for index in range(len(keys) - 2, -1, -1):
+            cached = self.summaries.get(keys[index])
+            if cached is not None:
+                previous, start = cached, index + 1
+                break
+
+        new_turns = "\n\n".join(turns[start:])
+        messages = [
+            {"role": "system", "content": "You maintain a running summary of a conversation between a user and an AI assistant. Keep the entities, facts, numbers, decisions and open questions that later messages may refer to. Reply with the updated summary only."},
+            {"role": "user", "content": f"Current summary:\n{previous or '(empty)'}\n\nNew turns:\n{new_turns}\n\nUpdated summary in at most {self.summary_max_tokens * 3 // 4} words:"}
+        ]
+        try:
+            summary = ai_model.generate(messages=messages, max_tokens=self.summary_max_tokens, temperature=0.2, call=call)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {e}")
+            # Keep the latest part of the raw turns rather than nothing; not cached so it is retried
+            return truncate_to_tokens(f"{previous}\n{new_turns}".strip()[-self.summary_max_tokens * 4:], self.summary_max_tokens)
+
+        self.summaries.set(keys[-1], summary)
+        logger.info(f"Folded {len(turns) - start} turns into the conversation summary ({len(turns)} turns total)")
+        return summary
+
+conversation_context = ConversationContext()
+
+def build_chat_history(history: List[Tuple[str, str]], ai_model: AIModel, deadline: Deadline) -> str:
+    """The conversation context within the request deadline, without a new summary of older turns if it runs out."""
+    chat_history = run_with_deadline(deadline.stage("history"), None, conversation_context.build, history, ai_model)
+    if chat_history is None:
+        chat_history = conversation_context.build(history, ai_model, summarize=False)
+    return chat_history
 
 # Helper function to get the appropriate client for each model
 def get_client_for_model(model: str) -> Any:
@@ -970,40 +2939,127 @@ def get_client_for_model(model: str) -> Any:
     else:
         raise ValueError(f"Unsupported model: {model}")
 
-def chat_function(message: str, history: List[Tuple[str, str]], only_web_search: bool, num_results: int, max_chars: int, time_range: str, language: str, category: str, engines: List[str], safesearch: int, method: str, llm_temperature: float, model: str, use_pydf2: bool):
-    chat_history = "\n".join([f"{role}: {msg}" for role, msg in history])
-    
-    # Create the appropriate AI model
-    ai_model = AIModelFactory.create_model(model, get_client_for_model(model))
-    
-    if only_web_search:
-        query_type = "web_search"
-    else:
-        query_type = determine_query_type(message, chat_history, ai_model)
-    
-    if query_type == "knowledge_base":
-        response = generate_ai_response(message, chat_history, ai_model, llm_temperature)
-    else:  # web_search
-        gr.Info("Initiating Web Search")
-        yield "Request you to sit back and relax until I scrape the web for up-to-date information"
-        response = search_and_scrape(
-            query=message,
-            chat_history=chat_history,
-            ai_model=ai_model,
-            num_results=num_results,
-            max_chars=max_chars,
-            time_range=time_range,
-            language=language,
-            category=category,
-            engines=engines,
-            safesearch=safesearch,
-            method=method,
-            llm_temperature=llm_temperature,
-            model=model,
-            use_pydf2=use_pydf2
-        )
-    
-    yield response
+def iter_chat(message: str, history: List[Tuple[str, str]], only_web_search: bool, num_results: int, max_chars: int, time_range: str, language: str, category: str, engines: List[str], safesearch: int, method: str, llm_temperature: float, model: str, use_pydf2: bool, deadline_seconds: float = 0, fanout_engines: bool = False, cascade: bool = False, profile: bool = False, speculative: bool = False, cascade_top_k: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Answer one chat message as a stream of pipeline events (see `iter_search_events`).
+    The last event is always a "result" event with the SearchResult; shared by the
+    Gradio chat and the HTTP API.
+
+    With `speculative`, rephrasing and the first search page start alongside classification
+    and are cancelled if the message turns out to need no web search. Skipped while the
+    LLM provider is congested, where the extra calls would only add to the queue.
+    """
+    def turn():
+        deadline = Deadline(deadline_seconds)
+        started = time.perf_counter()
+
+        # Create the appropriate AI model
+        ai_model = AIModelFactory.create_model(model, get_client_for_model(model))
+        chat_history = build_chat_history(history, ai_model, deadline)
+
+        speculation = None
+        if speculative and not llm_scheduler.congested(LLM_PROVIDERS[0]):
+            speculation = Speculation()
+            speculation.start_async("rephrase", arephrase_query(chat_history, message, llm_temperature))
+            params = build_search_params(message, time_range, language, category, engines, safesearch)
+            params['pageno'] = 1
+            speculation.start("search", speculation_executor, search_searxng_page, params, SEARXNG_HEADERS, engines, method, fanout_engines, deadline)
+            if not only_web_search:
+                speculation.start_async("classification", adetermine_query_type(message, chat_history, model))
+
+        if only_web_search:
+            query_type = "web_search"
+        elif speculation is not None:
+            query_type = speculation.result("classification", deadline.stage("classification"), "web_search")
+        else:
+            query_type = run_with_deadline(deadline.stage("classification"), "web_search", determine_query_type, message, chat_history, ai_model)
+        classification_time = round(time.perf_counter() - started, 3)
+
+        if query_type == "knowledge_base":
+            if speculation is not None:
+                outcomes, wasted = speculation.finish()
+            result = SearchResult(query=message, query_type=query_type, cut_short=deadline.cut_short)
+            result.answer = run_with_deadline(
+                deadline.stage("answer"),
+                "I couldn't answer within the request deadline. Please try again, or allow more time.",
+                generate_ai_response, message, chat_history, ai_model, llm_temperature
+            )
+        else:  # web_search
+            yield search_event("status", message="Request you to sit back and relax until I scrape the web for up-to-date information")
+            events = coalesced_search_events(
+                query=message,
+                chat_history=chat_history,
+                ai_model=ai_model,
+                num_results=num_results,
+                max_chars=max_chars,
+                time_range=time_range,
+                language=language,
+                category=category,
+                engines=engines,
+                safesearch=safesearch,
+                method=method,
+                llm_temperature=llm_temperature,
+                model=model,
+                use_pydf2=use_pydf2,
+                deadline_seconds=deadline_seconds,
+                deadline=deadline,
+                fanout_engines=fanout_engines,
+                cascade=cascade,
+                cascade_top_k=cascade_top_k,
+                speculation=speculation
+            )
+            try:
+                for event in events:
+                    if event["type"] == "result":
+                        result = event["result"]
+                    else:
+                        yield event
+            finally:
+                # Branches the search never reached, or all of them when it joined another request
+                if speculation is not None:
+                    outcomes, wasted = speculation.finish()
+
+        if speculation is not None:
+            result.speculation = outcomes
+            result.timings["speculation_wasted"] = wasted
+        result.timings["classification"] = classification_time
+        result.timings["total"] = round(time.perf_counter() - started, 3)
+        yield search_event("result", result=result)
+
+    # Profile the whole turn, knowledge-base answers included
+    yield from iter_profiled(profile, turn(), message)
+
+def render_event(event: Dict[str, Any]) -> Optional[str]:
+    """One markdown line of the progress log shown while a search runs."""
+    if event["type"] == "status":
+        return f"_{event['message']}_"
+    if event["type"] == "rephrased":
+        return f"Searching for **{event['query']}**"
+    if event["type"] == "search_results":
+        return f"Found {event['count']} results on page {event['page']}"
+    if event["type"] == "scraped":
+        return f"- Read [{event['title']}]({event['url']})"
+    if event["type"] == "assessed":
+        verdict = "relevant" if event["relevant"] else "not relevant"
+        return f"- [{event['title']}]({event['url']}) is {verdict}"
+    if event["type"] == "ranked":
+        return "Top sources: " + ", ".join(f"[{source['title']}]({source['url']})" for source in event["sources"])
+    return None
+
+def chat_function(message: str, history: List[Tuple[str, str]], only_web_search: bool, num_results: int, max_chars: int, time_range: str, language: str, category: str, engines: List[str], safesearch: int, method: str, llm_temperature: float, model: str, use_pydf2: bool, deadline_seconds: float = 0, fanout_engines: bool = False, cascade: bool = False, profile: bool = False, speculative: bool = False, request: gr.Request = None):
+    progress = []
+    session_id = getattr(request, "session_hash", None) or uuid.uuid4().hex
+    events = iter_chat(message, history, only_web_search, num_results, max_chars, time_range, language, category, engines, safesearch, method, llm_temperature, model, use_pydf2, deadline_seconds, fanout_engines, cascade, profile, speculative)
+    for event in run_in_session(events, session_id):
+        if event["type"] == "result":
+            yield event["result"].answer
+            continue
+        if not progress:
+            gr.Info("Initiating Web Search")
+        line = render_event(event)
+        if line:
+            progress.append(line)
+            yield "\n\n".join(progress)
 
 
 iface = gr.ChatInterface(
@@ -1029,6 +3085,11 @@ iface = gr.ChatInterface(
         gr.Slider(0, 1, value=0.2, step=0.1, label="LLM Temperature"),
         gr.Dropdown(all_models, value=default_model, label="LLM Model"),
         gr.Checkbox(label="Use PyPDF2 for PDF scraping", value=True),
+        gr.Slider(0, 300, value=0, step=5, label="Request deadline in seconds (0 = no limit)"),
+        gr.Checkbox(label="Query each engine separately and fuse the rankings", value=False),
+        gr.Checkbox(label="Pre-rank documents and only assess the top candidates with the LLM", value=False),
+        gr.Checkbox(label="Capture a performance profile of this request", value=False),
+        gr.Checkbox(label="Start rephrasing and searching while the query is classified", value=False),
     ],
     additional_inputs_accordion=gr.Accordion("⚙️ Advanced Parameters", open=True),
     retry_btn="Retry",
@@ -1042,9 +3103,169 @@ iface = gr.ChatInterface(
     )
 )
 
+# Headless HTTP API, served next to the Gradio UI
+class SearchRequest(BaseModel):
+    query: str
+    history: List[Tuple[str, str]] = []
+    num_results: int = 10
+    max_chars: int = 1500
+    time_range: str = ""
+    language: str = "en"
+    category: str = "general"
+    engines: List[str] = []
+    safesearch: int = 2
+    method: str = "GET"
+    llm_temperature: float = 0.2
+    model: str = default_model
+    use_pydf2: bool = True
+    deadline_seconds: float = 0
+    fanout_engines: bool = False
+    cascade: bool = False
+    cascade_top_k: int = 0
+    profile: bool = False
+    session_id: str = ""  # LLM calls are queued fairly between sessions; defaults to one per request
+
+    @field_validator("model")
+    @classmethod
+    def check_model(cls, model: str) -> str:
+        # Rejected here with a 422, and for a batch before any of its queries start
+        if model not in all_models:
+            raise ValueError(f"Unsupported model: {model}. Choose one of {', '.join(all_models)}")
+        return model
+
+class ChatRequest(SearchRequest):
+    only_web_search: bool = False
+    speculative: bool = False
+
+class Source(BaseModel):
+    title: str
+    url: str
+    summary: str
+    scraper: str
+
+class SearchResponse(BaseModel):
+    query: str
+    answer: str
+    query_type: str
+    rephrased_query: str
+    sources: List[Source]
+    timings: Dict[str, float]
+    cut_short: List[str]
+    speculation: Dict[str, str] = {}
+    error: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    requests: List[SearchRequest] = Field(..., min_length=1)
+
+class BatchResponse(BaseModel):
+    results: List[SearchResponse]
+    timings: Dict[str, float]
+
+# Batch queries run concurrently and share the scrape cache
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="batch")
+
+def iter_search_from_request(request: SearchRequest, session_id: str = "") -> Iterator[Dict[str, Any]]:
+    def events():
+        deadline = Deadline(request.deadline_seconds)
+        ai_model = AIModelFactory.create_model(request.model, get_client_for_model(request.model))
+        yield from coalesced_search_events(
+            query=request.query,
+            chat_history=build_chat_history(request.history, ai_model, deadline),
+            ai_model=ai_model,
+            num_results=request.num_results,
+            max_chars=request.max_chars,
+            time_range=request.time_range,
+            language=request.language,
+            category=request.category,
+            engines=request.engines,
+            safesearch=request.safesearch,
+            method=request.method,
+            llm_temperature=request.llm_temperature,
+            model=request.model,
+            use_pydf2=request.use_pydf2,
+            deadline_seconds=request.deadline_seconds,
+            deadline=deadline,
+            fanout_engines=request.fanout_engines,
+            cascade=request.cascade,
+            cascade_top_k=request.cascade_top_k
+        )
+
+    return run_in_session(iter_profiled(request.profile, events(), request.query), session_id or request.session_id or uuid.uuid4().hex)
+
+def search_from_request(request: SearchRequest, session_id: str = "") -> SearchResult:
+    return drain_search_events(iter_search_from_request(request, session_id))
+
+def iter_chat_from_request(request: ChatRequest) -> Iterator[Dict[str, Any]]:
+    events = iter_chat(
+        request.query, request.history, request.only_web_search, request.num_results, request.max_chars,
+        request.time_range, request.language, request.category, request.engines, request.safesearch,
+        request.method, request.llm_temperature, request.model, request.use_pydf2,
+        request.deadline_seconds, request.fanout_engines, request.cascade, request.profile,
+        request.speculative, request.cascade_top_k
+    )
+    return run_in_session(events, request.session_id or uuid.uuid4().hex)
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_events(events: Iterator[Dict[str, Any]]) -> StreamingResponse:
+    """Server-sent events for a pipeline event stream; the SearchResult goes out as the "result" event."""
+    def stream():
+        try:
+            for event in events:
+                data = {name: value for name, value in event.items() if name != "type"}
+                if event["type"] == "result":
+                    data = asdict(event["result"])
+                yield sse_event(event["type"], data)
+        except Exception as e:
+            logger.error(f"Error while streaming search events: {e}")
+            yield sse_event("error", {"message": str(e)})
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+app = FastAPI(title="Sentinel Search API")
+
+@app.post("/api/search", response_model=SearchResponse)
+def api_search(request: SearchRequest):
+    return asdict(search_from_request(request))
+
+@app.post("/api/search/stream")
+def api_search_stream(request: SearchRequest):
+    return stream_events(iter_search_from_request(request))
+
+@app.post("/api/chat", response_model=SearchResponse)
+def api_chat(request: ChatRequest):
+    return asdict(drain_search_events(iter_chat_from_request(request)))
+
+@app.post("/api/chat/stream")
+def api_chat_stream(request: ChatRequest):
+    return stream_events(iter_chat_from_request(request))
+
+@app.get("/api/llm/stats")
+def api_llm_stats():
+    """Per-provider LLM queue state: calls in flight, waiting per priority class and queue wait times."""
+    return run_on_llm_loop(llm_scheduler.stats())
+
+@app.post("/api/batch", response_model=BatchResponse)
+def api_batch(batch: BatchRequest):
+    started = time.perf_counter()
+    # A batch is one session, so it gets a fair share of the LLMs rather than one per query
+    session_id = uuid.uuid4().hex
+    futures = [batch_executor.submit(search_from_request, request, session_id) for request in batch.requests]
+    results = []
+    for request, future in zip(batch.requests, futures):
+        try:
+            results.append(asdict(future.result()))
+        except Exception as e:
+            logger.error(f"Error in batch query '{request.query}': {e}")
+            results.append({**asdict(SearchResult(query=request.query)), "error": str(e)})
+    return {"results": results, "timings": {"total": round(time.perf_counter() - started, 3)}}
+
+app = gr.mount_gradio_app(app, iface, path="/")
+
 if __name__ == "__main__":
     logger.info("Starting the SearXNG Scraper for News using ChatInterface with Advanced Parameters")
-    iface.launch(server_name="0.0.0.0", server_port=7860, share=False)
+    uvicorn.run(app, host="0.0.0.0", port=7860)
 
 
 
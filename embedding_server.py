@@ -0,0 +1,149 @@
+"""
+Shared embedding server for multi-worker deployments.
+
+Loads the sentence-transformers model once and serves batch encoding to every app worker
+on the node, over localhost HTTP or a Unix socket. Requests that arrive close together are
+merged into one micro-batch before they reach the model.
+
+    python embedding_server.py --port 7861
+    python embedding_server.py --socket /tmp/embeddings.sock
+
+Point the app at it with EMBEDDING_SERVER_URL=http://127.0.0.1:7861 or
+EMBEDDING_SERVER_URL=unix:///tmp/embeddings.sock.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from sentence_transformers import SentenceTransformer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+class MicroBatcher:
+    """
+    Collects encode requests from all handler threads and runs them through the model
+    together: a batch closes when it holds max_batch_size texts or max_wait seconds after
+    its first request arrived.
+    """
+    def __init__(self, model: SentenceTransformer, max_batch_size: int, max_wait: float):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        threading.Thread(target=self.run, name="micro-batcher", daemon=True).start()
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        future = Future()
+        self.requests.put((texts, future))
+        return future.result()
+
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            closes_at = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                embeddings = self.model.encode(texts, convert_to_numpy=True)
+            except Exception as e:
+                logger.error(f"Error encoding batch of {len(texts)} texts: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            logger.debug(f"Encoded {len(texts)} texts from {len(batch)} requests")
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(embeddings[offset:offset + len(item_texts)].tolist())
+                offset += len(item_texts)
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    batcher: MicroBatcher = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok", "model": EMBEDDING_MODEL})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/encode":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = body["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("'texts' must be a list of strings")
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        try:
+            self.send_json(200, {"embeddings": self.batcher.encode(texts)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Unix socket clients have no address, so skip the default address prefix
+        logger.debug(format % args)
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared sentence-transformers embedding server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("EMBEDDING_SERVER_PORT", "7861")))
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVER_SOCKET"), help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--max-batch-size", type=int, default=EMBEDDING_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBEDDING_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    logger.info(f"Loading embedding model {args.model}")
+    EmbeddingRequestHandler.batcher = MicroBatcher(SentenceTransformer(args.model), args.max_batch_size, args.max_wait_ms / 1000)
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, EmbeddingRequestHandler)
+        logger.info(f"Embedding server listening on unix://{args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), EmbeddingRequestHandler)
+        logger.info(f"Embedding server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,591 @@
+"""
+Concurrent-user load generator.
+
+Drives the chat with many simultaneous virtual users, through Gradio's queue (the same
+path as the browser UI) or through the streaming HTTP API. SearXNG, the scraped websites
+and the LLM are replaced by local stand-ins with configurable latency, so a run measures
+the app itself. It reports throughput, latency percentiles, time to first update, error
+rates, and the app process's memory and CPU over time.
+
+    python load_test.py --launch --users 20 --duration 120
+    python load_test.py --users 50 --think-time 5 --target api --pid 1234 --output report.json
+
+With --launch the app is started with its SearXNG and LLM settings pointed at the
+stand-ins. Without it, start the app yourself with the environment variables printed at
+startup.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STAND_IN_MODEL = "standin"
+
+WEB_QUERIES = [
+    "latest Federal Reserve interest rate decision",
+    "Nvidia quarterly earnings results",
+    "EU AI Act implementation timeline",
+    "oil prices after the OPEC meeting",
+    "new electric vehicle tax credit rules",
+    "SpaceX Starship latest launch",
+    "inflation report this month",
+    "Apple product announcements this week",
+    "semiconductor export restrictions update",
+    "central bank gold purchases",
+]
+
+KNOWLEDGE_QUERIES = [
+    "Hello, what can you do?",
+    "What is a binary search tree?",
+    "Explain how photosynthesis works",
+    "Who wrote Pride and Prejudice?",
+    "What is the difference between TCP and UDP?",
+]
+
+WORDS = (
+    "market growth report analysts revenue quarter policy government energy company "
+    "investors technology launch production demand supply forecast economy shares data "
+    "regulators agreement industry customers prices research results announcement global"
+).split()
+
+# Stand-in services: SearXNG, websites and an OpenAI-compatible LLM in one HTTP server
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options: argparse.Namespace = None
+    knowledge_queries: set = set()
+    # Responses the app hung up on before reading them, e.g. LLM calls cancelled at a deadline
+    abandoned_responses = 0
+    abandoned_lock = threading.Lock()
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/search":
+            self.search(parse_qs(urlparse(self.path).query))
+        elif path.startswith("/page/"):
+            self.page(path[len("/page/"):])
+        elif path.endswith("/models"):
+            self.send_json(200, {"data": [{"id": STAND_IN_MODEL, "object": "model"}]})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urlparse(self.path).path
+        if path == "/search":
+            self.search(parse_qs(body.decode("utf-8")))
+        elif path.endswith("/chat/completions"):
+            self.chat_completion(json.loads(body))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def search(self, params: Dict[str, List[str]]):
+        self.wait(self.options.searxng_latency)
+        query = params.get("q", [""])[0]
+        page = int(params.get("pageno", ["1"])[0])
+        results = []
+        if page <= self.options.search_pages:
+            host = self.headers.get("Host")
+            token = hashlib.sha1(query.encode("utf-8")).hexdigest()[:10]
+            for index in range(self.options.results_per_page):
+                page_id = f"{token}-{page}-{index}"
+                results.append({
+                    "title": f"{query.title()} ({page_id})",
+                    "url": f"http://{host}/page/{page_id}",
+                    "content": f"Search snippet about {query}",
+                    "engine": "standin",
+                })
+        self.send_json(200, {"query": query, "results": results})
+
+    def page(self, page_id: str):
+        self.wait(self.options.page_latency)
+        # Distinct text per page, so near-duplicate detection keeps every page
+        rng = random.Random(page_id)
+        paragraphs = []
+        size = 0
+        while size < self.options.page_size:
+            paragraph = " ".join(rng.choice(WORDS) for _ in range(60)).capitalize() + "."
+            paragraphs.append(f"<p>{paragraph}</p>")
+            size += len(paragraph)
+        html = f"<html><head><title>Article {page_id}</title></head><body><article><h1>Article {page_id}</h1>{''.join(paragraphs)}</article></body></html>"
+        self.send_body(200, "text/html; charset=utf-8", html.encode("utf-8"))
+
+    def chat_completion(self, request: dict):
+        if random.random() < self.options.llm_error_rate:
+            self.wait(self.options.llm_latency)
+            self.send_json(500, {"error": "injected stand-in LLM error"})
+            return
+        content = self.completion_for(request["messages"])
+        tokens = len(content) // 4 + 1
+        self.wait(self.options.llm_latency + tokens / self.options.llm_tokens_per_second * 1000)
+        self.send_json(200, {
+            "id": "standin",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", STAND_IN_MODEL),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def completion_for(self, messages: List[Dict[str, str]]) -> str:
+        """A plausible answer for each kind of prompt the app sends."""
+        system = messages[0]["content"] if messages else ""
+        prompt = messages[-1]["content"] if messages else ""
+        if '"knowledge_base" or "web_search"' in system:
+            is_knowledge = any(query in prompt for query in self.knowledge_queries)
+            return "knowledge_base" if is_knowledge else "web_search"
+        if prompt.rstrip().endswith("Rephrased query:"):
+            match = re.search(r"New query: (.*)", prompt)
+            return match.group(1).strip() if match else "news"
+        if "Relevant: [Yes/No]" in prompt:
+            return "Relevant: Yes\nSummary: " + " ".join(random.choice(WORDS) for _ in range(80))
+        if "comprehensive summary" in prompt:
+            return "\n".join(f"- {' '.join(random.choice(WORDS) for _ in range(40))} [{index}]" for index in range(1, 13))
+        return " ".join(random.choice(WORDS) for _ in range(120))
+
+    def wait(self, milliseconds: float):
+        # Jitter of +/-50% around the configured latency
+        time.sleep(milliseconds * random.uniform(0.5, 1.5) / 1000)
+
+    def send_json(self, status: int, payload: dict):
+        self.send_body(status, "application/json", json.dumps(payload).encode("utf-8"))
+
+    def send_body(self, status: int, content_type: str, data: bytes):
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            with StandInHandler.abandoned_lock:
+                StandInHandler.abandoned_responses += 1
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def start_stand_ins(args: argparse.Namespace, knowledge_queries: List[str]) -> ThreadingHTTPServer:
+    StandInHandler.options = args
+    StandInHandler.knowledge_queries = set(knowledge_queries)
+    server = ThreadingHTTPServer(("127.0.0.1", args.stand_in_port), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stand-ins", daemon=True).start()
+    return server
+
+def stand_in_environment(server: ThreadingHTTPServer) -> Dict[str, str]:
+    """App settings that send every search, scrape and LLM call to the stand-ins."""
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return {
+        "SEARXNG_URL": f"{base_url}/search",
+        "CUSTOM_LLM": base_url,
+        "CUSTOM_LLM_DEFAULT_MODEL": STAND_IN_MODEL,
+        "LLM_PROVIDERS": STAND_IN_MODEL,
+    }
+
+# Virtual users
+
+@dataclass
+class ChatSample:
+    user: int
+    kind: str
+    started: float  # seconds since the start of the run
+    latency: float
+    first_update: Optional[float]
+    error: Optional[str]
+
+def is_error_answer(answer: str) -> bool:
+    return answer.startswith(("Error:", "An error occurred", "An unexpected error occurred"))
+
+def chat_inputs(args: argparse.Namespace) -> list:
+    """The chat's additional inputs, in the order the UI declares them."""
+    return [
+        False,  # only_web_search: let the classifier decide
+        args.num_results,
+        args.max_chars,
+        "",  # time_range
+        "en",
+        "general",
+        args.engines,
+        2,  # safesearch
+        "GET",
+        0.2,  # llm_temperature
+        args.model,
+        True,  # use_pydf2
+        args.deadline,
+        args.fanout,
+        args.cascade,
+        False,  # profile
+        args.speculative,
+    ]
+
+class GradioChat:
+    """A conversation through Gradio's queue; the chat history lives in the client's session."""
+    def __init__(self, args: argparse.Namespace):
+        from gradio_client import Client
+        self.args = args
+        self.client = Client(args.app_url, verbose=False)
+
+    def send(self, message: str) -> Tuple[str, Optional[float]]:
+        started = time.perf_counter()
+        first_update = None
+        job = self.client.submit(message, *chat_inputs(self.args), api_name="/chat")
+        for _ in job:
+            if first_update is None:
+                first_update = time.perf_counter() - started
+        return str(job.result()), first_update
+
+class ApiChat:
+    """A conversation over /api/chat/stream; the chat history is sent with each request."""
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.session = requests.Session()
+        self.history: List[Tuple[str, str]] = []
+
+    def send(self, message: str) -> Tuple[str, Optional[float]]:
+        payload = {
+            "query": message,
+            "history": self.history,
+            "only_web_search": False,
+            "num_results": self.args.num_results,
+            "max_chars": self.args.max_chars,
+            "engines": self.args.engines,
+            "model": self.args.model,
+            "deadline_seconds": self.args.deadline,
+            "fanout_engines": self.args.fanout,
+            "cascade": self.args.cascade,
+            "speculative": self.args.speculative,
+        }
+        started = time.perf_counter()
+        first_update = None
+        event = None
+        answer = None
+        with self.session.post(f"{self.args.app_url}/api/chat/stream", json=payload, stream=True, timeout=self.args.request_timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if first_update is None:
+                    first_update = time.perf_counter() - started
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event == "result":
+                    answer = json.loads(line[len("data: "):])["answer"]
+                elif line.startswith("data: ") and event == "error":
+                    raise RuntimeError(json.loads(line[len("data: "):])["message"])
+        if answer is None:
+            raise RuntimeError("Stream ended without a result")
+        self.history.append((message, answer))
+        return answer, first_update
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, queries: Dict[str, List[str]]):
+        self.args = args
+        self.queries = queries
+        self.samples: List[ChatSample] = []
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stop_at = self.started + args.duration
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def run_user(self, user: int):
+        rng = random.Random(user)
+        time.sleep(self.args.ramp_up * user / max(self.args.users, 1))
+        chat = None
+        turns = 0
+        while time.perf_counter() < self.stop_at:
+            if chat is None or turns >= self.args.turns:
+                try:
+                    chat = GradioChat(self.args) if self.args.target == "gradio" else ApiChat(self.args)
+                except Exception as e:
+                    logger.error(f"User {user} could not connect: {e}")
+                    time.sleep(1)
+                    continue
+                turns = 0
+            kind = "knowledge" if rng.random() < self.args.knowledge_ratio else "web"
+            message = rng.choice(self.queries[kind])
+
+            started = self.elapsed()
+            with self.lock:
+                self.in_flight += 1
+            first_update = None
+            error = None
+            try:
+                answer, first_update = chat.send(message)
+                if is_error_answer(answer):
+                    error = answer[:200]
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"[:200]
+                chat = None
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+                    self.samples.append(ChatSample(user, kind, round(started, 3), round(self.elapsed() - started, 3), first_update and round(first_update, 3), error))
+            turns += 1
+            if self.args.think_time > 0:
+                time.sleep(rng.expovariate(1 / self.args.think_time))
+
+    def run(self) -> List[ChatSample]:
+        users = [threading.Thread(target=self.run_user, args=(user,), name=f"user-{user}", daemon=True) for user in range(self.args.users)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            # Requests still in flight at the end of the run are waited for
+            thread.join()
+        return self.samples
+
+# Process resource sampling (Linux /proc)
+
+class ResourceMonitor:
+    """Samples RSS, CPU usage and thread count of the app process at a fixed interval."""
+    def __init__(self, pid: int, load_test: LoadTest, interval: float):
+        self.pid = pid
+        self.load_test = load_test
+        self.interval = interval
+        self.timeline: List[dict] = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, name="resource-monitor", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def read_process(self) -> Tuple[float, int, int]:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        rss = threads = 0
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("Threads:"):
+                    threads = int(line.split()[1])
+        return cpu_seconds, rss, threads
+
+    def sample(self):
+        try:
+            last_cpu, _, _ = self.read_process()
+        except OSError as e:
+            logger.error(f"Cannot read process {self.pid}: {e}")
+            return
+        last_time = time.perf_counter()
+        last_completed = 0
+        while not self.stopped.wait(self.interval):
+            try:
+                cpu, rss, threads = self.read_process()
+            except OSError:
+                logger.warning(f"Process {self.pid} is gone; stopping resource sampling")
+                return
+            now = time.perf_counter()
+            completed = len(self.load_test.samples)
+            self.timeline.append({
+                "t": round(self.load_test.elapsed(), 1),
+                "rss_mb": round(rss / 2**20, 1),
+                "cpu_percent": round((cpu - last_cpu) / (now - last_time) * 100, 1),
+                "threads": threads,
+                "in_flight": self.load_test.in_flight,
+                "completed_per_second": round((completed - last_completed) / (now - last_time), 2),
+            })
+            last_cpu, last_time, last_completed = cpu, now, completed
+
+# Report
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+def summarize_samples(samples: List[ChatSample], duration: float) -> dict:
+    latencies = [sample.latency for sample in samples if sample.error is None]
+    first_updates = [sample.first_update for sample in samples if sample.first_update is not None]
+    errors = [sample for sample in samples if sample.error is not None]
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0,
+        "throughput_per_second": round(len(latencies) / duration, 3) if duration else 0,
+        "latency": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        "time_to_first_update": {f"p{p}": percentile(first_updates, p) for p in (50, 95, 99)},
+    }
+
+def build_report(args: argparse.Namespace, samples: List[ChatSample], timeline: List[dict], duration: float) -> dict:
+    errors: Dict[str, int] = {}
+    for sample in samples:
+        if sample.error is not None:
+            errors[sample.error] = errors.get(sample.error, 0) + 1
+    return {
+        "config": {name: value for name, value in vars(args).items() if name != "queries"},
+        "duration": round(duration, 1),
+        "overall": summarize_samples(samples, duration),
+        "by_kind": {kind: summarize_samples([sample for sample in samples if sample.kind == kind], duration) for kind in ("web", "knowledge")},
+        "top_errors": sorted(errors.items(), key=lambda item: -item[1])[:10],
+        "abandoned_stand_in_responses": StandInHandler.abandoned_responses,
+        "resources": {
+            "peak_rss_mb": max((point["rss_mb"] for point in timeline), default=None),
+            "mean_cpu_percent": round(sum(point["cpu_percent"] for point in timeline) / len(timeline), 1) if timeline else None,
+            "max_cpu_percent": max((point["cpu_percent"] for point in timeline), default=None),
+            "peak_threads": max((point["threads"] for point in timeline), default=None),
+        },
+        "timeline": timeline,
+        "samples": [asdict(sample) for sample in samples],
+    }
+
+def print_report(report: dict):
+    def row(label: str, stats: dict):
+        latency, first_update = stats["latency"], stats["time_to_first_update"]
+        print(f"{label:<10} {stats['requests']:>8} {stats['error_rate']:>7.1%} {stats['throughput_per_second']:>8.2f} "
+              f"{latency['p50'] or 0:>7.2f} {latency['p95'] or 0:>7.2f} {latency['p99'] or 0:>7.2f} "
+              f"{first_update['p50'] or 0:>7.2f} {first_update['p95'] or 0:>7.2f} {first_update['p99'] or 0:>7.2f}")
+
+    config = report["config"]
+    print(f"\n{config['users']} users, {config['target']} target, {report['duration']}s")
+    print(f"{'':<10} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'ttfu50':>7} {'ttfu95':>7} {'ttfu99':>7}")
+    row("all", report["overall"])
+    for kind, stats in report["by_kind"].items():
+        if stats["requests"]:
+            row(kind, stats)
+
+    resources = report["resources"]
+    if resources["peak_rss_mb"] is not None:
+        print(f"\nPeak RSS {resources['peak_rss_mb']} MB, CPU mean {resources['mean_cpu_percent']}% / max {resources['max_cpu_percent']}%, peak threads {resources['peak_threads']}")
+        print(f"{'t':>7} {'rss_mb':>8} {'cpu%':>7} {'threads':>8} {'in_flight':>10} {'done/s':>7}")
+        for point in report["timeline"]:
+            print(f"{point['t']:>7} {point['rss_mb']:>8} {point['cpu_percent']:>7} {point['threads']:>8} {point['in_flight']:>10} {point['completed_per_second']:>7}")
+    for error, count in report["top_errors"]:
+        print(f"{count:>6} x {error}")
+    if report["abandoned_stand_in_responses"]:
+        print(f"\n{report['abandoned_stand_in_responses']} stand-in responses were abandoned by the app (cancelled calls)")
+
+# App process
+
+def launch_app(environment: Dict[str, str], log_path: str) -> subprocess.Popen:
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    log_file = open(log_path, "w")
+    logger.info(f"Starting the app (output in {log_path})")
+    return subprocess.Popen([sys.executable, app_path], env={**os.environ, **environment}, stdout=log_file, stderr=subprocess.STDOUT)
+
+def wait_for_app(app_url: str, process: Optional[subprocess.Popen], timeout: float):
+    give_up_at = time.monotonic() + timeout
+    while time.monotonic() < give_up_at:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode} during startup")
+        try:
+            requests.get(app_url, timeout=2)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(1)
+    raise RuntimeError(f"The app did not come up at {app_url} within {timeout}s")
+
+def load_queries(path: Optional[str]) -> Dict[str, List[str]]:
+    """A query file has one query per line, optionally prefixed with 'web<TAB>' or 'knowledge<TAB>'."""
+    if not path:
+        return {"web": WEB_QUERIES, "knowledge": KNOWLEDGE_QUERIES}
+    queries = {"web": [], "knowledge": []}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            kind, _, query = line.partition("\t")
+            if kind in queries and query:
+                queries[kind].append(query)
+            else:
+                queries["web"].append(line)
+    if not queries["knowledge"]:
+        queries["knowledge"] = KNOWLEDGE_QUERIES
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the chat app")
+    parser.add_argument("--app-url", default="http://127.0.0.1:7860")
+    parser.add_argument("--target", choices=["gradio", "api"], default="gradio", help="Chat through Gradio's queue or /api/chat/stream")
+    parser.add_argument("--launch", action="store_true", help="Start app.py pointed at the stand-ins")
+    parser.add_argument("--app-log", default="load_test_app.log")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--pid", type=int, help="App process to sample memory and CPU from (automatic with --launch)")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep starting new chats")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which users join")
+    parser.add_argument("--think-time", type=float, default=2, help="Mean seconds a user waits between messages (exponential)")
+    parser.add_argument("--turns", type=int, default=3, help="Messages per conversation before a user starts a new one")
+    parser.add_argument("--queries", help="Query mix file; defaults to a built-in mix")
+    parser.add_argument("--knowledge-ratio", type=float, default=0.2, help="Share of messages the classifier should answer without a web search")
+    parser.add_argument("--request-timeout", type=float, default=600)
+    parser.add_argument("--model", default=STAND_IN_MODEL)
+    parser.add_argument("--num-results", type=int, default=5)
+    parser.add_argument("--max-chars", type=int, default=1500)
+    parser.add_argument("--engines", nargs="*", default=["google"])
+    parser.add_argument("--deadline", type=float, default=0)
+    parser.add_argument("--fanout", action="store_true")
+    parser.add_argument("--cascade", action="store_true")
+    parser.add_argument("--speculative", action="store_true", help="Rephrase and search while the query is classified")
+    parser.add_argument("--stand-in-port", type=int, default=7870)
+    parser.add_argument("--searxng-latency", type=float, default=300, help="Milliseconds")
+    parser.add_argument("--page-latency", type=float, default=150, help="Milliseconds")
+    parser.add_argument("--page-size", type=int, default=4000, help="Characters of text per page")
+    parser.add_argument("--results-per-page", type=int, default=10)
+    parser.add_argument("--search-pages", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=400, help="Milliseconds before the first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=150)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--sample-interval", type=float, default=2, help="Seconds between resource samples")
+    parser.add_argument("--output", help="Write the full report, with every request and the resource timeline, as JSON")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    server = start_stand_ins(args, queries["knowledge"])
+    environment = stand_in_environment(server)
+    logger.info("Stand-in services running. App settings: " + " ".join(f"{name}={value}" for name, value in environment.items()))
+
+    process = launch_app(environment, args.app_log) if args.launch else None
+    try:
+        wait_for_app(args.app_url, process, args.startup_timeout)
+        load_test = LoadTest(args, queries)
+        pid = process.pid if process is not None else args.pid
+        monitor = ResourceMonitor(pid, load_test, args.sample_interval) if pid else None
+        if monitor:
+            monitor.start()
+        logger.info(f"Running {args.users} users against {args.app_url} for {args.duration}s")
+        samples = load_test.run()
+        duration = load_test.elapsed()
+        if monitor:
+            monitor.stop()
+
+        report = build_report(args, samples, monitor.timeline if monitor else [], duration)
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Full report written to {args.output}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
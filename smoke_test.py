@@ -0,0 +1,87 @@
+"""
+Smoke check of the search pipeline against the load test's stand-in SearXNG, websites and
+LLM (see load_test.py), so no API keys or network access are needed.
+
+    python smoke_test.py
+
+Runs one web search through `run_search` and two messages through the chat, one of them
+speculative, and exits non-zero if any ends in an error answer or without sources.
+"""
+import argparse
+import logging
+import os
+import sys
+
+from load_test import KNOWLEDGE_QUERIES, is_error_answer, start_stand_ins, stand_in_environment
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Fast stand-ins: the check is about the pipeline working end to end, not about latency
+STAND_IN_OPTIONS = argparse.Namespace(
+    stand_in_port=0,
+    searxng_latency=10,
+    page_latency=5,
+    page_size=2000,
+    results_per_page=10,
+    search_pages=2,
+    llm_latency=10,
+    llm_tokens_per_second=10000,
+    llm_error_rate=0.0,
+)
+
+def check_result(name: str, result) -> list:
+    failures = []
+    if result is None:
+        return [f"{name}: no result"]
+    if is_error_answer(result.answer):
+        failures.append(f"{name}: error answer: {result.answer}")
+    if not result.sources:
+        failures.append(f"{name}: no sources")
+    if "search_and_scrape" not in result.timings:
+        failures.append(f"{name}: never reached the search and scrape stage")
+    return failures
+
+def main() -> int:
+    server = start_stand_ins(STAND_IN_OPTIONS, KNOWLEDGE_QUERIES)
+    # The app reads its settings at import time
+    os.environ.update(stand_in_environment(server))
+    os.environ.setdefault("GROQ_API_KEY", "unused")
+    os.environ.setdefault("MISTRAL_API_KEY", "unused")
+    import app
+
+    failures = []
+    try:
+        ai_model = app.AIModelFactory.create_model(app.CUSTOM_LLM_DEFAULT_MODEL, None)
+        result = app.run_search(
+            query="latest renewable energy policy news",
+            chat_history="",
+            ai_model=ai_model,
+            num_results=3,
+            engines=["google"],
+            model=app.CUSTOM_LLM_DEFAULT_MODEL,
+        )
+        failures += check_result("run_search", result)
+
+        result = app.drain_search_events(app.iter_chat(
+            "latest semiconductor export rules", [], True, 3, 1500, "", "en", "general", ["google"], 2, "GET",
+            0.2, app.CUSTOM_LLM_DEFAULT_MODEL, True
+        ))
+        failures += check_result("iter_chat", result)
+
+        result = app.drain_search_events(app.iter_chat(
+            "quarterly results of chip makers", [], False, 3, 1500, "", "en", "general", ["google"], 2, "GET",
+            0.2, app.CUSTOM_LLM_DEFAULT_MODEL, True, speculative=True
+        ))
+        failures += check_result("speculative iter_chat", result)
+    finally:
+        server.shutdown()
+
+    for failure in failures:
+        logger.error(failure)
+    if not failures:
+        logger.info("Smoke check passed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())